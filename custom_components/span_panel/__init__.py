@@ -5,18 +5,56 @@ from datetime import timedelta
 import logging
 
 import async_timeout
+from .models import DecodeError
 from .span_panel import SpanPanel
 import httpx
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST
+from homeassistant.const import CONF_HOST, EVENT_HOMEASSISTANT_STOP
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import Event, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.httpx_client import get_async_client
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .const import COORDINATOR, DOMAIN, NAME
+from .anomaly import SpanPanelAnomalyDetector
+from .const import (
+    ANOMALIES,
+    CONF_EXPORT_TARIFF,
+    CONF_METRICS,
+    CONF_SHED_HYSTERESIS,
+    CONF_SHED_LIMIT,
+    CONF_SHED_MIN_OFF_TIME,
+    CONF_SHED_MIN_ON_TIME,
+    CONF_STATISTICS,
+    CONF_TARIFF,
+    COORDINATOR,
+    COSTS,
+    DATA_EXPORTER,
+    DEFAULT_EXPORT_TARIFF,
+    DEFAULT_METRICS,
+    DEFAULT_SHED_HYSTERESIS,
+    DEFAULT_SHED_LIMIT,
+    DEFAULT_SHED_MIN_OFF_TIME,
+    DEFAULT_SHED_MIN_ON_TIME,
+    DEFAULT_STATISTICS,
+    DEFAULT_TARIFF,
+    DOMAIN,
+    EVENT_ANOMALY,
+    NAME,
+    PROFILES,
+    SHEDDER,
+    STATISTICS,
+    TOPOLOGY,
+)
+from .cost import SpanPanelCosts
+from .profiles import SpanPanelProfiles
+from .profiling import FANOUT, UPDATE
+from .services import async_setup_services, async_unload_services
+from .shedding import SpanPanelLoadShedder, async_release
+from .tariff import Tariff
+from .topology import async_track_topology, circuit_topology
 
 PLATFORMS: list[Platform] = [
    Platform.BINARY_SENSOR,
@@ -26,9 +64,24 @@ PLATFORMS: list[Platform] = [
 ]
 
 SCAN_INTERVAL = timedelta(seconds=15)
+SHED_INTERVAL = timedelta(seconds=1)
 
 _LOGGER = logging.getLogger(__name__)
 
+
+class SpanPanelCoordinator(DataUpdateCoordinator):
+    """Coordinator that times its listener fan-out while a profile runs."""
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all registered listeners."""
+        if self.data is None or (profiler := self.data.profiler) is None:
+            super().async_update_listeners()
+            return
+        with profiler.phase(FANOUT):
+            super().async_update_listeners()
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Span Panel from a config entry."""
     # TODO Store an API object for your platforms to access
@@ -37,38 +90,42 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     config = entry.data
     host = config[CONF_HOST]
 
-    _LOGGER.debug("ASYNC_SETUP_ENTRY %s" % host)
+    _LOGGER.debug("ASYNC_SETUP_ENTRY %s", host)
 
     span_panel = SpanPanel(
         config[CONF_HOST],
         async_client=get_async_client(hass),
     )
 
-    _LOGGER.debug("ASYNC_SETUP_ENTRY panel %s" % span_panel)
+    _LOGGER.debug("ASYNC_SETUP_ENTRY panel %s", span_panel)
+
+    async def _async_fetch():
+        await span_panel.async_snapshot()
 
     async def async_update_data():
         """Fetch data from API endpoint."""
-        _LOGGER.debug("ASYNC_UPDATE_DATA %s" % span_panel)
+        _LOGGER.debug("ASYNC_UPDATE_DATA %s", span_panel)
         async with async_timeout.timeout(30):
             try:
-                await span_panel.circuits.getData()
-                await span_panel.getStatusData()
-                await span_panel.getPanelData()
+                if (profiler := span_panel.profiler) is not None:
+                    with profiler.phase(UPDATE):
+                        await _async_fetch()
+                else:
+                    await _async_fetch()
             except httpx.HTTPStatusError as err:
-                raise ConfigEntryAuthFailed from err
+                if err.response.status_code in (401, 403):
+                    raise ConfigEntryAuthFailed from err
+                raise UpdateFailed(f"Error communicating with API: {err}") from err
             except httpx.HTTPError as err:
                 raise UpdateFailed(f"Error communicating with API: {err}") from err
-
-            data = { }
-            data["circuits"] = span_panel.circuits
-            data["panel"] = span_panel.panel_results.json()
-#            _LOGGER.debug("Retrieved data from API: %s", data)
+            except DecodeError as err:
+                raise UpdateFailed(f"Unexpected response from API: {err}") from err
 
             return span_panel
 
     name = "SN-TODO"
 
-    coordinator = DataUpdateCoordinator(
+    coordinator = SpanPanelCoordinator(
         hass,
         _LOGGER,
         name=f"span panel {name}",
@@ -78,13 +135,120 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await coordinator.async_config_entry_first_refresh()
 
+    shedder = None
+    options = entry.options
+    shed_limit = options.get(CONF_SHED_LIMIT, DEFAULT_SHED_LIMIT)
+    if shed_limit > 0:
+        shedder = SpanPanelLoadShedder(
+            hass,
+            entry,
+            span_panel,
+            limit=shed_limit,
+            hysteresis=options.get(CONF_SHED_HYSTERESIS, DEFAULT_SHED_HYSTERESIS),
+            min_off_time=options.get(CONF_SHED_MIN_OFF_TIME, DEFAULT_SHED_MIN_OFF_TIME),
+            min_on_time=options.get(CONF_SHED_MIN_ON_TIME, DEFAULT_SHED_MIN_ON_TIME),
+            on_change=coordinator.async_request_refresh,
+        )
+        await shedder.async_load()
+        entry.async_on_unload(
+            async_track_time_interval(hass, shedder.async_sample, SHED_INTERVAL)
+        )
+    else:
+        # Circuits a shedder left open, if it could not close them on unload
+        await async_release(hass, entry, span_panel)
+
+    statistics = None
+    if options.get(CONF_STATISTICS, DEFAULT_STATISTICS):
+        # Imported here so the recorder is only loaded when it is used
+        from .long_term_statistics import SpanPanelStatistics
+
+        statistics = SpanPanelStatistics(hass, entry, coordinator)
+        await statistics.async_load()
+        entry.async_on_unload(coordinator.async_add_listener(statistics.async_sample))
+
+        async def _async_save_statistics(event: Event) -> None:
+            # Shutdown does not unload entries
+            await statistics.async_save()
+
+        entry.async_on_unload(
+            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_save_statistics)
+        )
+
+    if options.get(CONF_METRICS, DEFAULT_METRICS):
+        from .exporter import async_get_exporter
+
+        exporter = async_get_exporter(hass)
+
+        @callback
+        def _async_export() -> None:
+            if coordinator.last_update_success:
+                exporter.update(span_panel)
+
+        _async_export()
+        entry.async_on_unload(coordinator.async_add_listener(_async_export))
+
+    profiles = SpanPanelProfiles(hass, entry, coordinator, SCAN_INTERVAL.total_seconds())
+    await profiles.async_load()
+    profiles.async_sample()
+    # Added before the anomaly detector, which reads the profiles
+    entry.async_on_unload(coordinator.async_add_listener(profiles.async_sample))
+
+    anomalies = SpanPanelAnomalyDetector(SCAN_INTERVAL.total_seconds(), profiles)
+
+    @callback
+    def _async_detect_anomalies() -> None:
+        if not coordinator.last_update_success:
+            return
+        circuits = span_panel.circuits
+        for anomaly in anomalies.update(circuits.circuit_data):
+            hass.bus.async_fire(
+                EVENT_ANOMALY,
+                {
+                    "serial_number": span_panel.serial_number,
+                    "circuit_id": anomaly.circuit_id,
+                    "circuit_name": circuits.name(anomaly.circuit_id),
+                    "type": anomaly.kind,
+                    "active": anomaly.active,
+                    "value": anomaly.value,
+                    "baseline": anomaly.baseline,
+                },
+            )
+
+    # Added before the platforms so entities see this refresh's anomalies
+    entry.async_on_unload(coordinator.async_add_listener(_async_detect_anomalies))
+
+    costs = None
+    if tariff := options.get(CONF_TARIFF, DEFAULT_TARIFF):
+        export_tariff = options.get(CONF_EXPORT_TARIFF, DEFAULT_EXPORT_TARIFF)
+        try:
+            tariffs = Tariff(tariff), Tariff(export_tariff) if export_tariff else None
+        except ValueError as err:
+            # Saved before the options flow checked as strictly
+            _LOGGER.error("Not tracking energy cost, the tariff is invalid: %s", err)
+        else:
+            costs = SpanPanelCosts(hass, entry, coordinator, *tariffs)
+    if costs is not None:
+        await costs.async_load()
+        costs.async_sample()
+        entry.async_on_unload(coordinator.async_add_listener(costs.async_sample))
+
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         COORDINATOR: coordinator,
+        ANOMALIES: anomalies,
+        COSTS: costs,
+        PROFILES: profiles,
         NAME: name,
+        SHEDDER: shedder,
+        STATISTICS: statistics,
+        TOPOLOGY: (topology := circuit_topology(span_panel)),
     }
 
+    entry.async_on_unload(async_track_topology(hass, entry, coordinator, topology))
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     hass.config_entries.async_setup_platforms(entry, PLATFORMS)
+    async_setup_services(hass)
 
     return True
 
@@ -93,6 +257,21 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     _LOGGER.debug("ASYNC_UNLOAD")
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        if (shedder := data[SHEDDER]) is not None:
+            await shedder.async_restore_all()
+        if (statistics := data[STATISTICS]) is not None:
+            await statistics.async_save()
+        if (costs := data[COSTS]) is not None:
+            await costs.async_save()
+        await data[PROFILES].async_save()
+        if (exporter := hass.data.get(DATA_EXPORTER)) is not None:
+            exporter.remove(data[COORDINATOR].data.serial_number)
+        async_unload_services(hass)
 
     return unload_ok
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
@@ -0,0 +1,208 @@
+"""Streaming anomaly detection on circuit power samples.
+
+Stuck relays are caught sample by sample. Changes in how much a circuit
+draws are judged an hour at a time against the circuit's usage profile
+for that hour of the week, so daily and weekly patterns and the on/off
+cycling of appliances are part of the baseline rather than anomalies.
+Each circuit costs a fixed handful of floats and each coordinator
+refresh is a single pass over the circuits.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+from .span_panel import CIRCUITS_RELAY_CLOSED
+
+if TYPE_CHECKING:
+    from .profiles import SpanPanelProfiles
+
+STUCK_RELAY = "stuck_relay"
+POWER_SHIFT = "power_shift"
+DUTY_CYCLE_DRIFT = "duty_cycle_drift"
+
+# Drawing more than this through an open relay is a stuck relay
+STUCK_POWER_W = 10
+STUCK_SAMPLES = 2
+
+# An hour's mean power deviates when it is off the profile by more than
+# SHIFT_RATIO of the profile and by more than SHIFT_MIN_W, and a shift is
+# reported after SHIFT_HOURS such hours in a row in the same direction
+SHIFT_RATIO = 0.5
+SHIFT_MIN_W = 30.0
+SHIFT_HOURS = 3
+# Weeks of samples a profile hour needs before it is trusted as a baseline
+PROFILE_MIN_WEEKS = 2
+# Hours with less of their samples (a restart, an open relay) are skipped
+HOUR_MIN_COVERAGE = 0.8
+
+# A circuit counts as running above this. When an hour deviates while the
+# circuit draws its usual running power (within ON_POWER_TOLERANCE) it is
+# running more or less often: a duty cycle drift, not a power shift.
+ON_POWER_W = 15
+ON_POWER_WINDOW = 7 * 86400
+ON_POWER_TOLERANCE = 0.2
+
+
+class Anomaly(NamedTuple):
+    """A circuit entering or leaving an anomalous state.
+
+    For POWER_SHIFT and DUTY_CYCLE_DRIFT, value is the mean power of the
+    last hour and baseline the profile's mean for that hour, in W.
+    """
+
+    circuit_id: str
+    kind: str
+    active: bool
+    value: float
+    baseline: float
+
+
+class _CircuitState:
+    """Running statistics of one circuit."""
+
+    __slots__ = (
+        "hour_sum",
+        "hour_samples",
+        "hour_on_sum",
+        "hour_on_samples",
+        "hour_valid",
+        "baseline",
+        "on_power",
+        "streak",
+        "shifted",
+        "stuck_count",
+        "stuck",
+    )
+
+    def __init__(self) -> None:
+        self.hour_sum = 0.0
+        self.hour_samples = 0
+        self.hour_on_sum = 0.0
+        self.hour_on_samples = 0
+        self.hour_valid = False
+        # The profile's mean for this hour, read when the hour started
+        self.baseline: float | None = None
+        self.on_power = 0.0
+        # Consecutive deviating hours, negative below the profile
+        self.streak = 0
+        # POWER_SHIFT or DUTY_CYCLE_DRIFT while one is active
+        self.shifted: str | None = None
+        self.stuck_count = 0
+        self.stuck = False
+
+
+class SpanPanelAnomalyDetector:
+    """Watch every circuit of a panel for stuck relays, shifts and drift."""
+
+    def __init__(self, interval: float, profiles: SpanPanelProfiles):
+        """Init the detector for samples taken every interval seconds.
+
+        profiles must have sampled the same refresh before update() runs.
+        """
+        self._profiles = profiles
+        self._on_alpha = min(1.0, interval / ON_POWER_WINDOW)
+        self._hour_samples = 3600 / interval
+        self._profile_samples = PROFILE_MIN_WEEKS * 3600 / interval
+        self._hour: int | None = None
+        self._states: dict[str, _CircuitState] = {}
+
+    @property
+    def active(self) -> dict[str, list[str]]:
+        """Return the ids of the circuits in each anomaly."""
+        active: dict[str, list[str]] = {}
+        for id, state in self._states.items():
+            if state.stuck:
+                active.setdefault(STUCK_RELAY, []).append(id)
+            if state.shifted is not None:
+                active.setdefault(state.shifted, []).append(id)
+        return active
+
+    def update(self, circuit_data: dict) -> list[Anomaly]:
+        """Feed one sample of every circuit and return the state changes."""
+        states = self._states
+        changes: list[Anomaly] = []
+
+        hour = self._profiles.hour
+        if hour != self._hour:
+            if self._hour is not None:
+                for id, state in states.items():
+                    self._check_hour(id, state, changes)
+            self._hour = hour
+            for id, state in states.items():
+                state.hour_sum = state.hour_on_sum = 0.0
+                state.hour_samples = state.hour_on_samples = 0
+                state.hour_valid = True
+                # Read now, as the profile folds in the rest of the hour
+                # while it is being judged
+                state.baseline = self._profiles.baseline(id, hour, self._profile_samples)
+
+        for id, circuit in circuit_data.items():
+            power = abs(circuit.instant_power_w)
+            closed = circuit.relay_state == CIRCUITS_RELAY_CLOSED
+            if (state := states.get(id)) is None:
+                # Its first hour is partial, so it is not judged
+                state = states[id] = _CircuitState()
+            self._check_relay(id, state, power, closed, changes)
+            if not closed:
+                # An hour the relay was open says nothing about the load
+                state.hour_valid = False
+                continue
+            state.hour_sum += power
+            state.hour_samples += 1
+            if power > ON_POWER_W:
+                state.hour_on_sum += power
+                state.hour_on_samples += 1
+                if state.on_power:
+                    state.on_power += self._on_alpha * (power - state.on_power)
+                else:
+                    state.on_power = power
+
+        if len(states) != len(circuit_data):
+            for id in states.keys() - circuit_data.keys():
+                del states[id]
+        return changes
+
+    def _check_relay(self, id, state, power, closed, changes) -> None:
+        if not closed and power > STUCK_POWER_W:
+            state.stuck_count += 1
+            if state.stuck_count == STUCK_SAMPLES:
+                state.stuck = True
+                changes.append(Anomaly(id, STUCK_RELAY, True, power, 0.0))
+        elif state.stuck_count:
+            state.stuck_count = 0
+            if state.stuck:
+                state.stuck = False
+                changes.append(Anomaly(id, STUCK_RELAY, False, power, 0.0))
+
+    def _check_hour(self, id, state, changes) -> None:
+        """Judge the hour that just ended against the profile."""
+        if (
+            not state.hour_valid
+            or state.hour_samples < HOUR_MIN_COVERAGE * self._hour_samples
+            or (baseline := state.baseline) is None
+        ):
+            return
+
+        mean = state.hour_sum / state.hour_samples
+        deviation = mean - baseline
+        if abs(deviation) <= max(SHIFT_RATIO * baseline, SHIFT_MIN_W):
+            state.streak = 0
+            if state.shifted is not None:
+                changes.append(Anomaly(id, state.shifted, False, mean, baseline))
+                state.shifted = None
+            return
+
+        if (deviation > 0) == (state.streak > 0):
+            state.streak += 1 if deviation > 0 else -1
+        else:
+            state.streak = 1 if deviation > 0 else -1
+        if abs(state.streak) == SHIFT_HOURS and state.shifted is None:
+            state.shifted = (
+                DUTY_CYCLE_DRIFT
+                if state.hour_on_samples
+                and state.on_power
+                and abs(state.hour_on_sum / state.hour_on_samples - state.on_power)
+                <= ON_POWER_TOLERANCE * state.on_power
+                else POWER_SHIFT
+            )
+            changes.append(Anomaly(id, state.shifted, True, mean, baseline))
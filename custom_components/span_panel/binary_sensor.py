@@ -3,9 +3,7 @@ from __future__ import annotations
 
 from collections.abc import Callable
 from dataclasses import dataclass
-import datetime
 import logging
-from typing import cast
 
 from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
@@ -14,15 +12,12 @@ from homeassistant.components.binary_sensor import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-)
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from .const import COORDINATOR, DOMAIN
-from .util import panel_to_device_info
+from .anomaly import SpanPanelAnomalyDetector
+from .const import ANOMALIES, COORDINATOR, DOMAIN
+from .entity import SpanPanelEntity
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -65,7 +60,7 @@ BINARY_SENSORS = (
     ),
 )
 
-class SpanPanelBinarySensor(CoordinatorEntity, BinarySensorEntity):
+class SpanPanelBinarySensor(SpanPanelEntity, BinarySensorEntity):
     """Envoy inverter entity."""
 
     def __init__(
@@ -74,23 +69,48 @@ class SpanPanelBinarySensor(CoordinatorEntity, BinarySensorEntity):
         description: SpanPanelBinarySensorEntityDescription,
     ) -> None:
         """Initialize Span Panel Circuit entity."""
-        span_panel: SpanPanel = coordinator.data
-
         self.entity_description = description
-        self._attr_name = f"{description.name}"
-        self._attr_unique_id = f"span_{span_panel.serial_number}_{description.key}"
-        self._attr_device_info = panel_to_device_info(span_panel)
+        self._attr_name = description.name
+        super().__init__(coordinator, description.key)
 
-        _LOGGER.debug("CREATE BINSENSOR [%s]" % self._attr_name)
-        super().__init__(coordinator)
+        _LOGGER.debug("CREATE BINSENSOR [%s]", self._attr_name)
 
     @property
     def is_on(self):
         """Return the status of the sensor."""
-        _LOGGER.debug("BINSENSOR [%s] IS_ON" % self._attr_name)
+        _LOGGER.debug("BINSENSOR [%s] IS_ON", self._attr_name)
         span_panel: SpanPanel = self.coordinator.data
         return self.entity_description.value_fn(span_panel)
 
+class SpanPanelAnomalySensor(SpanPanelEntity, BinarySensorEntity):
+    """On while any circuit has a stuck relay or has been off its usual load for hours."""
+
+    _attr_device_class = BinarySensorDeviceClass.PROBLEM
+    _attr_name = "Circuit Anomaly"
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        anomalies: SpanPanelAnomalyDetector,
+    ) -> None:
+        """Initialize the anomaly sensor."""
+        self.anomalies = anomalies
+        super().__init__(coordinator, "anomaly")
+
+    @property
+    def is_on(self):
+        """Return if any circuit is anomalous."""
+        return bool(self.anomalies.active)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the names of the anomalous circuits by anomaly type."""
+        circuits = self.coordinator.data.circuits
+        return {
+            kind: [circuits.name(id) for id in ids]
+            for kind, ids in self.anomalies.active.items()
+        }
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: ConfigEntry,
@@ -103,7 +123,6 @@ async def async_setup_entry(
     data: dict = hass.data[DOMAIN][config_entry.entry_id]
 
     coordinator: DataUpdateCoordinator = data[COORDINATOR]
-    span_panel: SpanPanel = coordinator.data
 
     entities: list[SpanPanelBinarySensor] = []
 
@@ -112,4 +131,6 @@ async def async_setup_entry(
            SpanPanelBinarySensor(coordinator, description)
         )
 
+    entities.append(SpanPanelAnomalySensor(coordinator, data[ANOMALIES]))
+
     async_add_entities(entities)
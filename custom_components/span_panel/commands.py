@@ -0,0 +1,117 @@
+"""Audit trail and command-to-effect latency of circuit commands.
+
+Every relay and priority command is kept in a ring buffer with its HTTP
+result. A command is confirmed by the first later circuits fetch showing
+the requested state, so its latency includes however long the panel took
+to act on it plus the delay until that fetch.
+"""
+from __future__ import annotations
+
+from collections import deque
+import logging
+import time
+
+RELAY = "relay"
+PRIORITY = "priority"
+
+# The circuit attribute each kind of command changes
+_ATTRIBUTES = {RELAY: "relay_state", PRIORITY: "priority"}
+
+HISTORY = 100
+# Give up waiting for a command's effect after this many seconds
+CONFIRM_TIMEOUT = 300
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Command:
+    """One command sent to the panel."""
+
+    __slots__ = (
+        "circuit_id",
+        "kind",
+        "target",
+        "sent_at",
+        "started",
+        "status",
+        "error",
+        "effect_latency",
+        "outcome",
+    )
+
+    def __init__(self, circuit_id: str, kind: str, target: str):
+        self.circuit_id = circuit_id
+        self.kind = kind
+        self.target = target
+        self.sent_at = time.time()
+        self.started = time.monotonic()
+        self.status: int | None = None
+        self.error: str | None = None
+        self.effect_latency: float | None = None
+        # pending, confirmed, failed, superseded or timed out
+        self.outcome = "pending"
+
+    def as_dict(self) -> dict:
+        """Return the command as plain data."""
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != "started"}
+
+
+class CommandTracker:
+    """Record commands and confirm them against later circuit data."""
+
+    def __init__(self, history: int = HISTORY):
+        """Init the tracker."""
+        self.history: deque[Command] = deque(maxlen=history)
+        self._pending: dict[tuple[str, str], Command] = {}
+
+    def sent(self, circuit_id: str, kind: str, target: str) -> Command:
+        """Record a command about to be posted."""
+        command = Command(circuit_id, kind, target)
+        if (previous := self._pending.pop((circuit_id, kind), None)) is not None:
+            previous.outcome = "superseded"
+        self.history.append(command)
+        return command
+
+    def result(self, command: Command, status: int | None, error: str | None = None) -> None:
+        """Record the HTTP result of a command, or the error posting it."""
+        command.status = status
+        command.error = error
+        if error is None and status is not None and status < 400:
+            self._pending[(command.circuit_id, command.kind)] = command
+        else:
+            command.outcome = "failed"
+            _LOGGER.warning(
+                "Setting %s of circuit %s to %s failed: %s",
+                command.kind,
+                command.circuit_id,
+                command.target,
+                error or status,
+            )
+
+    def confirm(self, circuit_data: dict) -> None:
+        """Confirm the pending commands whose effect circuit_data shows."""
+        if not self._pending:
+            return
+        now = time.monotonic()
+        for key, command in list(self._pending.items()):
+            circuit = circuit_data.get(command.circuit_id)
+            if circuit is not None and getattr(circuit, _ATTRIBUTES[command.kind]) == command.target:
+                command.effect_latency = now - command.started
+                command.outcome = "confirmed"
+            elif now - command.started > CONFIRM_TIMEOUT:
+                command.outcome = "timed out"
+            else:
+                continue
+            del self._pending[key]
+            _LOGGER.debug("Command %s", command.as_dict())
+
+    def latency(self, percentile: float) -> float | None:
+        """Return a percentile of the confirmed commands' latency in seconds."""
+        latencies = sorted(
+            command.effect_latency
+            for command in self.history
+            if command.effect_latency is not None
+        )
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
@@ -4,20 +4,41 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from .span_panel import SpanPanel
-import httpx
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.components import zeroconf
 from homeassistant.const import CONF_HOST
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.httpx_client import get_async_client
 from homeassistant.util.network import is_ipv4_address
 
-from .const import DOMAIN
+from .const import (
+    CONF_EXPORT_TARIFF,
+    CONF_METRICS,
+    CONF_SHED_HYSTERESIS,
+    CONF_SHED_LIMIT,
+    CONF_SHED_MIN_OFF_TIME,
+    CONF_SHED_MIN_ON_TIME,
+    CONF_STATE_INTERVAL,
+    CONF_STATISTICS,
+    CONF_TARIFF,
+    DATA_DISCOVERY,
+    DEFAULT_EXPORT_TARIFF,
+    DEFAULT_METRICS,
+    DEFAULT_SHED_HYSTERESIS,
+    DEFAULT_SHED_LIMIT,
+    DEFAULT_SHED_MIN_OFF_TIME,
+    DEFAULT_SHED_MIN_ON_TIME,
+    DEFAULT_STATE_INTERVAL,
+    DEFAULT_STATISTICS,
+    DEFAULT_TARIFF,
+    DOMAIN,
+)
+from .discovery import SpanPanelDiscovery
+from .tariff import Tariff
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,19 +52,26 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 )
 
 
-async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> SpanPanel:
-    """Validate the user input allows us to connect."""
-    span_panel = SpanPanel(
-        data[CONF_HOST],
-        async_client=get_async_client(hass),
-    )
+@callback
+def async_get_discovery(hass: HomeAssistant) -> SpanPanelDiscovery:
+    """Return the discovery engine shared by all flows."""
+    if (discovery := hass.data.get(DATA_DISCOVERY)) is None:
+        discovery = hass.data[DATA_DISCOVERY] = SpanPanelDiscovery(
+            async_client=get_async_client(hass)
+        )
+    return discovery
 
-    try:
-        await span_panel.getStatusData()
-    except (RuntimeError, httpx.HTTPError) as err:
-        raise CannotConnect from err
 
-    return span_panel
+async def validate_input(
+    hass: HomeAssistant, data: dict[str, Any], use_cache: bool = True
+) -> str:
+    """Validate the user input allows us to connect and return the serial."""
+    serial = await async_get_discovery(hass).async_probe(
+        data[CONF_HOST], use_cache=use_cache
+    )
+    if serial is None:
+        raise CannotConnect
+    return serial
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -56,6 +84,14 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self.host: str | None = None
         self.sn: str | None = None
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
     async def async_step_zeroconf(
         self, discovery_info: zeroconf.ZeroconfServiceInfo
     ) -> FlowResult:
@@ -65,19 +101,21 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if not is_ipv4_address(discovery_info.host):
             return self.async_abort(reason="not_ipv4_address")
 
-        panel = await validate_input(self.hass, {CONF_HOST: discovery_info.host})
+        # Rediscovery of a configured host needs no network I/O at all, and
+        # a recently probed host is answered from the discovery cache.
+        self._async_abort_entries_match({CONF_HOST: discovery_info.host})
 
-        self.host = discovery_info.host
+        try:
+            self.sn = await validate_input(self.hass, {CONF_HOST: discovery_info.host})
+        except CannotConnect:
+            return self.async_abort(reason="cannot_connect")
 
-        self.sn = panel.serial_number
-        _LOGGER.debug("SN: %s ip %s" % (self.sn, self.host))
+        self.host = discovery_info.host
+        _LOGGER.debug("SN: %s ip %s", self.sn, self.host)
 
         await self.async_set_unique_id(self.sn)
         self._abort_if_unique_id_configured(updates={CONF_HOST: self.host})
 
-        for entry in self._async_current_entries(include_ignore=False):
-            _LOGGER.warning("entry loop")
-
         return await self.async_step_confirm_discovery()
 
     async def async_step_confirm_discovery(
@@ -124,21 +162,123 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 return self.async_show_form(step_id="confirm")
 
         errors = {}
+        host = user_input[CONF_HOST]
 
         try:
-            info = await validate_input(self.hass, user_input)
+            if "/" in host:
+                host, serial = await self._async_sweep(host)
+            else:
+                # What the user typed is always probed; a cached failure
+                # would hide a connection they just fixed
+                serial = await validate_input(self.hass, user_input, use_cache=False)
         except CannotConnect:
             errors["base"] = "cannot_connect"
+        except InvalidNetwork:
+            errors[CONF_HOST] = "invalid_network"
+        except NoDevicesFound:
+            errors["base"] = "no_devices_found"
         except Exception:  # pylint: disable=broad-except
             _LOGGER.exception("Unexpected exception")
             errors["base"] = "unknown"
         else:
-            return self.async_create_entry(title=info.serial_number, data=user_input)
+            await self.async_set_unique_id(serial)
+            self._abort_if_unique_id_configured(updates={CONF_HOST: host})
+            return self.async_create_entry(title=serial, data={CONF_HOST: host})
 
         return self.async_show_form(
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
 
+    async def _async_sweep(self, network: str) -> tuple[str, str]:
+        """Find an unconfigured panel on a network without mDNS."""
+        try:
+            found = await async_get_discovery(self.hass).async_sweep(
+                network, use_cache=False
+            )
+        except ValueError as err:
+            raise InvalidNetwork from err
+
+        configured = {entry.unique_id for entry in self._async_current_entries()}
+        for host, serial in sorted(found.items()):
+            if serial not in configured:
+                return host, serial
+        raise NoDevicesFound
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Span Panel options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            for key in (CONF_TARIFF, CONF_EXPORT_TARIFF):
+                if user_input.get(key):
+                    try:
+                        Tariff(user_input[key])
+                    except ValueError:
+                        errors[key] = "invalid_tariff"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_SHED_LIMIT,
+                    default=options.get(CONF_SHED_LIMIT, DEFAULT_SHED_LIMIT),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_SHED_HYSTERESIS,
+                    default=options.get(CONF_SHED_HYSTERESIS, DEFAULT_SHED_HYSTERESIS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_SHED_MIN_OFF_TIME,
+                    default=options.get(CONF_SHED_MIN_OFF_TIME, DEFAULT_SHED_MIN_OFF_TIME),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_SHED_MIN_ON_TIME,
+                    default=options.get(CONF_SHED_MIN_ON_TIME, DEFAULT_SHED_MIN_ON_TIME),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_STATISTICS,
+                    default=options.get(CONF_STATISTICS, DEFAULT_STATISTICS),
+                ): bool,
+                vol.Optional(
+                    CONF_STATE_INTERVAL,
+                    default=options.get(CONF_STATE_INTERVAL, DEFAULT_STATE_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=15)),
+                vol.Optional(
+                    CONF_METRICS,
+                    default=options.get(CONF_METRICS, DEFAULT_METRICS),
+                ): bool,
+                vol.Optional(
+                    CONF_TARIFF,
+                    default=options.get(CONF_TARIFF, DEFAULT_TARIFF),
+                ): str,
+                vol.Optional(
+                    CONF_EXPORT_TARIFF,
+                    default=options.get(CONF_EXPORT_TARIFF, DEFAULT_EXPORT_TARIFF),
+                ): str,
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
+
+
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
+
+
+class InvalidNetwork(HomeAssistantError):
+    """Error to indicate the network to sweep is invalid or too large."""
+
+
+class NoDevicesFound(HomeAssistantError):
+    """Error to indicate a sweep found no unconfigured panel."""
@@ -3,3 +3,40 @@
 DOMAIN = "span_panel"
 COORDINATOR = "coordinator"
 NAME = "name"
+DATA_DISCOVERY = f"{DOMAIN}_discovery"
+DATA_EXPORTER = f"{DOMAIN}_exporter"
+SHEDDER = "shedder"
+ANOMALIES = "anomalies"
+COSTS = "costs"
+PROFILES = "profiles"
+STATISTICS = "statistics"
+TOPOLOGY = "topology"
+
+EVENT_ANOMALY = f"{DOMAIN}_anomaly"
+
+CONF_SHED_LIMIT = "shed_limit"
+CONF_SHED_HYSTERESIS = "shed_hysteresis"
+CONF_SHED_MIN_OFF_TIME = "shed_min_off_time"
+CONF_SHED_MIN_ON_TIME = "shed_min_on_time"
+
+DEFAULT_SHED_LIMIT = 0
+DEFAULT_SHED_HYSTERESIS = 500
+DEFAULT_SHED_MIN_OFF_TIME = 60
+DEFAULT_SHED_MIN_ON_TIME = 60
+
+CONF_STATISTICS = "statistics"
+CONF_STATE_INTERVAL = "state_interval"
+
+DEFAULT_STATISTICS = False
+DEFAULT_STATE_INTERVAL = 300
+
+CONF_METRICS = "metrics"
+
+DEFAULT_METRICS = False
+
+
+CONF_TARIFF = "tariff"
+CONF_EXPORT_TARIFF = "export_tariff"
+
+DEFAULT_TARIFF = ""
+DEFAULT_EXPORT_TARIFF = ""
@@ -0,0 +1,134 @@
+"""Accumulate energy cost per circuit, per priority tier and for mains."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .tariff import Tariff
+
+MAINS = "mains"
+
+STORAGE_VERSION = 1
+# Totals are written to disk at most this often, in seconds
+SAVE_DELAY = 60
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SpanPanelCosts:
+    """Running cost totals, fed with the energy meter deltas of each tick.
+
+    Imported energy is charged at the import tariff and exported energy
+    credited at the export tariff, both at the rate in effect when the
+    snapshot was taken. After each refresh, changed holds the keys (circuit
+    ids, priorities and MAINS) whose totals moved, so cost sensors only
+    write state when their energy did.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: DataUpdateCoordinator,
+        tariff: Tariff,
+        export_tariff: Tariff | None = None,
+    ):
+        """Init the accumulator."""
+        self.coordinator = coordinator
+        self.tariff = tariff
+        self.export_tariff = export_tariff
+        self.circuits: dict[str, float] = {}
+        self.tiers: dict[str, float] = {}
+        self.mains = 0.0
+        self.changed: set[str] = set()
+        # id or MAINS -> [consumed Wh, produced Wh] at the last sample
+        self._meters: dict[str, list[float]] = {}
+        self._save_scheduled = False
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.costs")
+
+    async def async_load(self) -> None:
+        """Restore the totals and meter readings saved last time."""
+        if (data := await self._store.async_load()) is None:
+            return
+        self.circuits = data["circuits"]
+        self.tiers = data["tiers"]
+        self.mains = data["mains"]
+        self._meters = data["meters"]
+
+    def _data_to_save(self) -> dict:
+        # Called by the store when it writes
+        self._save_scheduled = False
+        return {
+            "circuits": self.circuits,
+            "tiers": self.tiers,
+            "mains": self.mains,
+            "meters": self._meters,
+        }
+
+    async def async_save(self) -> None:
+        """Write the totals now."""
+        await self._store.async_save(self._data_to_save())
+
+    def _cost(self, key: str, consumed: float, produced: float, import_rate, export_rate):
+        """Return the cost since the last sample of a meter and remember it."""
+        if (meter := self._meters.get(key)) is None:
+            self._meters[key] = [consumed, produced]
+            return 0.0
+        used = consumed - meter[0]
+        fed = produced - meter[1]
+        meter[0] = consumed
+        meter[1] = produced
+        if used < 0 or fed < 0:
+            # The meter was reset; start counting from the new reading
+            return 0.0
+        return (used * import_rate - fed * export_rate) / 1000
+
+    @callback
+    def async_sample(self) -> None:
+        """Add the cost of the energy used since the previous snapshot."""
+        self.changed = set()
+        if not self.coordinator.last_update_success:
+            return
+
+        snapshot = self.coordinator.data.snapshot
+        when = dt_util.as_local(dt_util.utc_from_timestamp(snapshot.sample_time))
+        import_rate = self.tariff.rate_at(when)
+        export_rate = self.export_tariff.rate_at(when) if self.export_tariff else 0.0
+        changed = self.changed
+
+        for id, circuit in snapshot.circuits.items():
+            cost = self._cost(
+                id,
+                circuit.consumed_energy_wh,
+                circuit.produced_energy_wh,
+                import_rate,
+                export_rate,
+            )
+            if cost:
+                self.circuits[id] = self.circuits.get(id, 0.0) + cost
+                self.tiers[circuit.priority] = self.tiers.get(circuit.priority, 0.0) + cost
+                changed.add(id)
+                changed.add(circuit.priority)
+
+        mains = snapshot.panel.main_meter_energy
+        if cost := self._cost(
+            MAINS, mains.consumed_energy_wh, mains.produced_energy_wh, import_rate, export_rate
+        ):
+            self.mains += cost
+            changed.add(MAINS)
+
+        if len(self._meters) > len(snapshot.circuits) + 1:
+            for id in self._meters.keys() - snapshot.circuits.keys() - {MAINS}:
+                del self._meters[id]
+                self.circuits.pop(id, None)
+
+        if changed and not self._save_scheduled:
+            # Rescheduling on every tick would postpone the write forever
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
@@ -0,0 +1,114 @@
+"""Find Span Panels and map hosts to serial numbers quickly."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+import ipaddress
+import logging
+import time
+
+import httpx
+
+from .models import DecodeError
+from .scheduler import PRIORITY_DIAGNOSTIC
+from .span_panel import SpanPanel
+
+DEFAULT_PROBE_TIMEOUT = 5
+SWEEP_PROBE_TIMEOUT = 2
+DEFAULT_CACHE_TTL = 3600
+# Unreachable hosts are remembered for less time than panels
+NEGATIVE_CACHE_TTL = 60
+MAX_SWEEP_HOSTS = 256
+MAX_CONCURRENT_PROBES = 32
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SpanPanelDiscovery:
+    """Probe hosts for Span Panels and cache host to serial results."""
+
+    def __init__(
+        self,
+        async_client=None,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+    ):
+        """Init the discovery engine."""
+        self._async_client = async_client
+        self.probe_timeout = probe_timeout
+        self.cache_ttl = cache_ttl
+        # host -> (expiry, serial or None when the host is not a panel)
+        self._cache: dict[str, tuple[float, str | None]] = {}
+
+    def cached(self, host: str) -> tuple[bool, str | None]:
+        """Return (hit, serial) for a host without any network I/O."""
+        host = host.lower()
+        if (entry := self._cache.get(host)) is None:
+            return False, None
+        expires, serial = entry
+        if time.monotonic() >= expires:
+            del self._cache[host]
+            return False, None
+        return True, serial
+
+    def remember(self, host: str, serial: str | None) -> None:
+        """Cache the serial found at a host, or None if there is no panel."""
+        ttl = self.cache_ttl if serial is not None else NEGATIVE_CACHE_TTL
+        self._cache[host.lower()] = (time.monotonic() + ttl, serial)
+
+    async def async_probe(
+        self, host: str, timeout: float | None = None, use_cache: bool = True
+    ) -> str | None:
+        """Return the serial of the panel at host, or None if there is none.
+
+        Without use_cache the host is always probed, e.g. when a user
+        retries after fixing the connection; the result is still cached.
+        """
+        if use_cache:
+            hit, serial = self.cached(host)
+            if hit:
+                return serial
+
+        span_panel = SpanPanel(
+            host,
+            async_client=self._async_client,
+            timeout=timeout or self.probe_timeout,
+            retries=1,
+        )
+        try:
+            await span_panel.getStatusData(PRIORITY_DIAGNOSTIC)
+        except (httpx.HTTPError, DecodeError) as err:
+            _LOGGER.debug("No Span Panel at %s: %s", host, err)
+            serial = None
+        else:
+            serial = span_panel.serial_number
+
+        self.remember(host, serial)
+        return serial
+
+    async def async_probe_many(
+        self, hosts: Iterable[str], timeout: float | None = None, use_cache: bool = True
+    ) -> dict[str, str]:
+        """Probe hosts concurrently and return the serial of each panel found."""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+
+        async def _probe(host: str) -> str | None:
+            async with semaphore:
+                return await self.async_probe(host, timeout, use_cache)
+
+        hosts = list(hosts)
+        serials = await asyncio.gather(*(_probe(host) for host in hosts))
+        return {host: serial for host, serial in zip(hosts, serials) if serial}
+
+    async def async_sweep(self, network: str, use_cache: bool = True) -> dict[str, str]:
+        """Probe every address of a small IPv4 network.
+
+        Raises ValueError for an invalid network or one with more than
+        MAX_SWEEP_HOSTS addresses.
+        """
+        net = ipaddress.IPv4Network(network, strict=False)
+        if net.num_addresses > MAX_SWEEP_HOSTS:
+            raise ValueError(f"{network} has more than {MAX_SWEEP_HOSTS} addresses")
+        return await self.async_probe_many(
+            (str(address) for address in net.hosts()), SWEEP_PROBE_TIMEOUT, use_cache
+        )
@@ -0,0 +1,62 @@
+"""Base entities for the Span Panel integration."""
+from __future__ import annotations
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import (
+    CoordinatorEntity,
+    DataUpdateCoordinator,
+)
+
+from .span_panel import SpanPanel
+from .util import panel_to_device_info
+
+
+class SpanPanelEntity(CoordinatorEntity):
+    """Entity of a Span Panel.
+
+    Unique id and device info are computed once at creation; the device
+    info object is shared by every entity of the panel.
+    """
+
+    def __init__(self, coordinator: DataUpdateCoordinator, unique_suffix: str) -> None:
+        """Initialize the entity."""
+        span_panel: SpanPanel = coordinator.data
+        self._attr_unique_id = f"span_{span_panel.serial_number}_{unique_suffix}"
+        self._attr_device_info = panel_to_device_info(span_panel)
+        super().__init__(coordinator)
+
+
+class SpanPanelCircuitEntity(SpanPanelEntity):
+    """Entity of a single circuit, named after the circuit."""
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        id: str,
+        unique_suffix: str,
+        name_suffix: str,
+    ) -> None:
+        """Initialize the entity."""
+        self.id = id
+        self._name_suffix = name_suffix
+        self._circuit_name = coordinator.data.circuits.name(id)
+        self._attr_name = f"{self._circuit_name} {name_suffix}"
+        super().__init__(coordinator, unique_suffix)
+
+    @property
+    def available(self) -> bool:
+        """Return if the circuit still exists on the panel."""
+        return super().available and self.id in self.coordinator.data.circuits.keys()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Follow circuit renames, then write the new state."""
+        circuits = self.coordinator.data.circuits
+        if self.id not in circuits.keys():
+            # The circuit is gone; the topology tracker removes this entity.
+            return
+        circuit_name = circuits.name(self.id)
+        if circuit_name != self._circuit_name:
+            self._circuit_name = circuit_name
+            self._attr_name = f"{circuit_name} {self._name_suffix}"
+        super()._handle_coordinator_update()
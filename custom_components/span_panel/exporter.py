@@ -0,0 +1,37 @@
+"""Serve Span Panel data to Prometheus from Home Assistant."""
+from __future__ import annotations
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_EXPORTER
+from .openmetrics import CONTENT_TYPE, OpenMetricsExporter
+
+
+class SpanPanelMetricsView(HomeAssistantView):
+    """Expose every panel with the exporter enabled in OpenMetrics format."""
+
+    url = "/api/span_panel/metrics"
+    name = "api:span_panel:metrics"
+
+    def __init__(self, exporter: OpenMetricsExporter) -> None:
+        """Initialize the view."""
+        self.exporter = exporter
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Return the current exposition."""
+        return web.Response(
+            body=self.exporter.render(),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+
+@callback
+def async_get_exporter(hass: HomeAssistant) -> OpenMetricsExporter:
+    """Return the exporter, registering its view on first use."""
+    if (exporter := hass.data.get(DATA_EXPORTER)) is None:
+        exporter = hass.data[DATA_EXPORTER] = OpenMetricsExporter()
+        hass.http.register_view(SpanPanelMetricsView(exporter))
+    return exporter
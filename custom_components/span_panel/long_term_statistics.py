@@ -0,0 +1,154 @@
+"""Import circuit power and energy into long-term statistics."""
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ENERGY_WATT_HOUR, POWER_WATT
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SpanPanelStatistics:
+    """Aggregate every sample of every circuit into hourly statistics.
+
+    Each coordinator refresh is folded into running per-circuit aggregates;
+    when the hour rolls over the finished hour of every circuit is imported
+    into the recorder as external statistics in one pass. This keeps
+    full resolution in the energy dashboard while the circuit sensors
+    themselves only write state occasionally. Those sensors have no state
+    class in this mode, so these are the only statistics of the circuits.
+
+    On stop or unload the running hour is imported as it stands and saved,
+    so after a restart within the same hour it is continued rather than
+    overwritten by the samples taken since.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, coordinator: DataUpdateCoordinator
+    ):
+        """Init the aggregator."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self._hour: datetime | None = None
+        # id -> [count, total, min, max] of instant power this hour
+        self._power: dict[str, list[float]] = {}
+        # id -> [consumed, produced] energy meter readings at the last sample
+        self._energy: dict[str, list[float]] = {}
+        self._names: dict[str, str] = {}
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.statistics")
+
+    def _statistic_id(self, id: str, kind: str) -> str:
+        serial = self.coordinator.data.serial_number
+        return f"{DOMAIN}:{slugify(f'{serial}_{id}_{kind}')}"
+
+    async def async_load(self) -> None:
+        """Continue the hour saved at the last stop, if it is still running."""
+        if (data := await self._store.async_load()) is None:
+            return
+        hour = dt_util.parse_datetime(data["hour"])
+        if hour != dt_util.utcnow().replace(minute=0, second=0, microsecond=0):
+            return
+        self._hour = hour
+        self._power = data["power"]
+        self._energy = data["energy"]
+        self._names = data["names"]
+
+    async def async_save(self) -> None:
+        """Import the running hour as it stands and save it to be continued."""
+        if self._hour is None:
+            return
+        self._async_import()
+        await self._store.async_save(
+            {
+                "hour": self._hour.isoformat(),
+                "power": self._power,
+                "energy": self._energy,
+                "names": self._names,
+            }
+        )
+
+    @callback
+    def async_sample(self) -> None:
+        """Fold the latest coordinator data into the running hour."""
+        if not self.coordinator.last_update_success:
+            return
+
+        hour = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+        if self._hour is not None and hour != self._hour:
+            self._async_import()
+            self._power.clear()
+        self._hour = hour
+
+        circuits = self.coordinator.data.circuits
+        for id in circuits.keys():
+            power = abs(circuits.power(id))
+            if (agg := self._power.get(id)) is None:
+                self._power[id] = [1, power, power, power]
+            else:
+                agg[0] += 1
+                agg[1] += power
+                if power < agg[2]:
+                    agg[2] = power
+                if power > agg[3]:
+                    agg[3] = power
+            self._energy[id] = [circuits.energy_consumed(id), circuits.energy_produced(id)]
+            self._names[id] = circuits.name(id)
+
+    def _energy_statistic(self, id: str, kind: str, name: str, reading: float) -> None:
+        # The panel's meters are monotonic, so the reading is the sum
+        async_add_external_statistics(
+            self.hass,
+            StatisticMetaData(
+                has_mean=False,
+                has_sum=True,
+                name=name,
+                source=DOMAIN,
+                statistic_id=self._statistic_id(id, kind),
+                unit_of_measurement=ENERGY_WATT_HOUR,
+            ),
+            [StatisticData(start=self._hour, state=reading, sum=reading)],
+        )
+
+    @callback
+    def _async_import(self) -> None:
+        """Import the aggregates of the running hour."""
+        if not self._power:
+            return
+
+        _LOGGER.debug("Importing statistics of %s circuits for %s", len(self._power), self._hour)
+        for id, (count, total, minimum, maximum) in self._power.items():
+            name = self._names[id]
+            async_add_external_statistics(
+                self.hass,
+                StatisticMetaData(
+                    has_mean=True,
+                    has_sum=False,
+                    name=f"{name} Power",
+                    source=DOMAIN,
+                    statistic_id=self._statistic_id(id, "power"),
+                    unit_of_measurement=POWER_WATT,
+                ),
+                [
+                    StatisticData(
+                        start=self._hour,
+                        mean=total / count,
+                        min=minimum,
+                        max=maximum,
+                    )
+                ],
+            )
+            consumed, produced = self._energy[id]
+            self._energy_statistic(id, "consumed_energy", f"{name} Consumed Energy", consumed)
+            self._energy_statistic(id, "produced_energy", f"{name} Produced Energy", produced)
@@ -0,0 +1,226 @@
+"""Typed models for the Span Panel API payloads.
+
+Every payload is described once, in SCHEMA. When msgspec is installed the
+schema is turned into msgspec structs and responses are decoded straight
+into them. Otherwise responses are parsed with orjson (or the stdlib json
+module) and converted into slotted records with the same attribute names,
+so callers never see which backend is in use.
+
+Every firmware seen so far uses the same keys (only the circuits URL moved,
+see SpanPanel.circuits_url), so there is one layout. A payload that does not
+match it fails here, once, naming the panel's firmware, instead of in every
+accessor.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if msgspec is not None:
+    BACKEND = "msgspec"
+elif orjson is not None:
+    BACKEND = "orjson"
+else:
+    BACKEND = "json"
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+_DECODE_ERRORS: tuple[type[Exception], ...] = (
+    ValueError,
+    KeyError,
+    TypeError,
+    AttributeError,
+)
+if msgspec is not None:
+    _DECODE_ERRORS += (msgspec.DecodeError,)
+
+
+class DecodeError(ValueError):
+    """A payload did not match the expected schema."""
+
+
+# model name -> ((attribute, JSON key, type), ...)
+# A type is a Python type, the name of another model, or a one element
+# dict {str: model name} for an object keyed by id.
+# Only keys the integration reads belong here: every listed key is
+# required, so one the panel stops sending fails the whole refresh.
+SCHEMA: dict[str, tuple[tuple[str, str, Any], ...]] = {
+    "System": (
+        ("serial", "serial", str),
+        ("model", "model", str),
+        ("door_state", "doorState", str),
+    ),
+    "Network": (
+        ("eth0_link", "eth0Link", bool),
+        ("wlan_link", "wlanLink", bool),
+        ("wwan_link", "wwanLink", bool),
+    ),
+    "Software": (
+        ("firmware_version", "firmwareVersion", str),
+    ),
+    "Status": (
+        ("system", "system", "System"),
+        ("network", "network", "Network"),
+        ("software", "software", "Software"),
+    ),
+    "Energy": (
+        ("produced_energy_wh", "producedEnergyWh", float),
+        ("consumed_energy_wh", "consumedEnergyWh", float),
+    ),
+    "Panel": (
+        ("instant_grid_power_w", "instantGridPowerW", float),
+        ("feedthrough_power_w", "feedthroughPowerW", float),
+        ("main_meter_energy", "mainMeterEnergy", "Energy"),
+        ("feedthrough_energy", "feedthroughEnergy", "Energy"),
+    ),
+    "Circuit": (
+        ("name", "name", str),
+        ("relay_state", "relayState", str),
+        ("instant_power_w", "instantPowerW", float),
+        ("produced_energy_wh", "producedEnergyWh", float),
+        ("consumed_energy_wh", "consumedEnergyWh", float),
+        ("tabs", "tabs", list[int]),
+        ("priority", "priority", str),
+        ("is_user_controllable", "is_user_controllable", bool),
+    ),
+    "Circuits": (
+        ("circuits", "circuits", {str: "Circuit"}),
+    ),
+}
+
+
+class Record:
+    """Slotted record used when msgspec is not available."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{a}={getattr(self, a)!r}" for a in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+def _build_msgspec_models() -> dict[str, type]:
+    models: dict[str, type] = {}
+
+    def resolve(kind):
+        if isinstance(kind, str):
+            return models[kind]
+        if isinstance(kind, dict):
+            ((key_type, value_type),) = kind.items()
+            return dict[key_type, resolve(value_type)]
+        return kind
+
+    # SCHEMA lists every model after the models it refers to
+    for name, fields in SCHEMA.items():
+        models[name] = msgspec.defstruct(
+            name,
+            [(attr, resolve(kind), msgspec.field(name=key)) for attr, key, kind in fields],
+            module=__name__,
+        )
+    return models
+
+
+def _checker(kind):
+    """Return a type check for a scalar field, like msgspec's."""
+    if kind is float:
+        return lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+    if kind is int:
+        return lambda value: isinstance(value, int) and not isinstance(value, bool)
+    if kind in (str, bool):
+        return lambda value: isinstance(value, kind)
+    return lambda value: isinstance(value, list)
+
+
+def _build_records() -> tuple[dict[str, type], dict[str, Any]]:
+    models: dict[str, type] = {}
+    converters: dict[str, Any] = {}
+
+    def converter_for(kind):
+        if isinstance(kind, str):
+            return converters[kind]
+        if isinstance(kind, dict):
+            ((_, value_type),) = kind.items()
+            convert_value = converters[value_type]
+            return lambda obj: {k: convert_value(v) for k, v in obj.items()}
+        return None
+
+    for name, fields in SCHEMA.items():
+        model = type(name, (Record,), {"__slots__": tuple(f[0] for f in fields)})
+        steps = tuple(
+            (
+                attr,
+                key,
+                sub := converter_for(kind),
+                _checker(kind) if sub is None else None,
+            )
+            for attr, key, kind in fields
+        )
+
+        def convert(obj, name=name, model=model, steps=steps):
+            record = model.__new__(model)
+            for attr, key, sub, check in steps:
+                try:
+                    value = obj[key]
+                except KeyError:
+                    raise DecodeError(f"{name} is missing {key!r}") from None
+                if sub is not None:
+                    value = sub(value)
+                elif not check(value):
+                    raise DecodeError(f"{name}.{key} is {value!r}")
+                setattr(record, attr, value)
+            return record
+
+        models[name] = model
+        converters[name] = convert
+    return models, converters
+
+
+def _build_decoders() -> dict[str, Any]:
+    if msgspec is not None:
+        models = _build_msgspec_models()
+        return {
+            name: msgspec.json.Decoder(models[name]).decode
+            for name in ("Status", "Panel", "Circuits")
+        }
+    _, converters = _build_records()
+    return {
+        name: (lambda content, convert=converters[name]: convert(_loads(content)))
+        for name in ("Status", "Panel", "Circuits")
+    }
+
+
+_DECODERS = _build_decoders()
+
+
+def _decode(name: str, content: bytes, firmware: str | None):
+    try:
+        return _DECODERS[name](content)
+    except _DECODE_ERRORS as err:
+        raise DecodeError(
+            f"Invalid {name} payload for firmware {firmware or 'unknown'}: {err}"
+        ) from err
+
+
+def decode_status(content: bytes, firmware: str | None = None):
+    """Decode a /status response body."""
+    return _decode("Status", content, firmware)
+
+
+def decode_panel(content: bytes, firmware: str | None = None):
+    """Decode a /panel response body."""
+    return _decode("Panel", content, firmware)
+
+
+def decode_circuits(content: bytes, firmware: str | None = None) -> dict:
+    """Decode a /circuits (or /spaces) response body into circuits by id."""
+    return _decode("Circuits", content, firmware).circuits
@@ -0,0 +1,161 @@
+"""Render Span Panel data in the OpenMetrics text format.
+
+The exporter keeps every sample line it has rendered. Updating it with a
+new panel snapshot only re-renders the lines whose value changed, only
+re-joins the metric families containing them, and only rebuilds the final
+buffer when something changed, so frequent scrapes just hand out bytes.
+"""
+from __future__ import annotations
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+GAUGE = "gauge"
+COUNTER = "counter"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Family:
+    """One metric family and its rendered sample lines."""
+
+    __slots__ = ("header", "sample_name", "samples", "block")
+
+    def __init__(self, name: str, type: str, help: str):
+        self.header = f"# TYPE {name} {type}\n# HELP {name} {help}\n"
+        self.sample_name = f"{name}_total" if type == COUNTER else name
+        # (serial, ...) -> (value, labels, rendered line)
+        self.samples: dict[tuple, tuple[float, tuple, str]] = {}
+        self.block: str | None = None
+
+    def set(self, key: tuple, labels: tuple[tuple[str, str], ...], value: float) -> bool:
+        current = self.samples.get(key)
+        if current is not None and current[0] == value and current[1] == labels:
+            return False
+        rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        self.samples[key] = (
+            value,
+            labels,
+            f"{self.sample_name}{{{rendered}}} {float(value)!r}\n",
+        )
+        self.block = None
+        return True
+
+    def prune(self, serial: str, keep: set[tuple] | None = None) -> bool:
+        """Drop the samples of a panel that are not in keep."""
+        stale = [
+            key
+            for key in self.samples
+            if key[0] == serial and (keep is None or key not in keep)
+        ]
+        for key in stale:
+            del self.samples[key]
+        if stale:
+            self.block = None
+        return bool(stale)
+
+    def render(self) -> str:
+        if self.block is None:
+            self.block = self.header + "".join(line for _, _, line in self.samples.values())
+        return self.block
+
+
+FAMILIES = (
+    ("span_panel_grid_power_watts", GAUGE, "Instant grid power."),
+    ("span_panel_feedthrough_power_watts", GAUGE, "Instant feed through power."),
+    ("span_panel_main_meter_energy_watt_hours", COUNTER, "Main meter energy."),
+    ("span_panel_feedthrough_energy_watt_hours", COUNTER, "Feed through energy."),
+    ("span_circuit_power_watts", GAUGE, "Instant circuit power."),
+    ("span_circuit_energy_watt_hours", COUNTER, "Circuit energy."),
+    ("span_circuit_relay_closed", GAUGE, "1 if the circuit relay is closed."),
+    ("span_client_requests", COUNTER, "HTTP requests sent to the panel."),
+    ("span_client_retries", COUNTER, "HTTP requests retried after a transport error."),
+    ("span_client_errors", COUNTER, "HTTP requests that failed."),
+    ("span_client_coalesced_requests", COUNTER, "GETs answered by a shared or cached request."),
+)
+
+
+class OpenMetricsExporter:
+    """Incrementally rendered OpenMetrics exposition of one or more panels."""
+
+    def __init__(self):
+        """Init the exporter."""
+        self._families = {name: _Family(name, type, help) for name, type, help in FAMILIES}
+        self._buffer: bytes | None = None
+
+    def update(self, span_panel) -> None:
+        """Fold the current data of a panel into the exposition."""
+        serial = span_panel.serial_number
+        panel = span_panel.panel_data
+        circuits = span_panel.circuits
+        families = self._families
+        labels = (("serial", serial),)
+        changed = False
+        seen: dict[str, set[tuple]] = {}
+
+        def _set(family: str, key: tuple, labels: tuple, value: float) -> None:
+            nonlocal changed
+            changed |= families[family].set((serial,) + key, labels, value)
+            seen.setdefault(family, set()).add((serial,) + key)
+
+        _set("span_panel_grid_power_watts", (), labels, panel.instant_grid_power_w)
+        _set("span_panel_feedthrough_power_watts", (), labels, panel.feedthrough_power_w)
+        for family, energy in (
+            ("span_panel_main_meter_energy_watt_hours", panel.main_meter_energy),
+            ("span_panel_feedthrough_energy_watt_hours", panel.feedthrough_energy),
+        ):
+            for direction, value in (
+                ("consumed", energy.consumed_energy_wh),
+                ("produced", energy.produced_energy_wh),
+            ):
+                _set(family, (direction,), labels + (("direction", direction),), value)
+
+        for id in circuits.keys():
+            circuit_labels = labels + (("circuit", id), ("name", circuits.name(id)))
+            _set("span_circuit_power_watts", (id,), circuit_labels, abs(circuits.power(id)))
+            for direction, value in (
+                ("consumed", circuits.energy_consumed(id)),
+                ("produced", circuits.energy_produced(id)),
+            ):
+                _set(
+                    "span_circuit_energy_watt_hours",
+                    (id, direction),
+                    circuit_labels + (("direction", direction),),
+                    value,
+                )
+            _set(
+                "span_circuit_relay_closed",
+                (id,),
+                circuit_labels,
+                int(circuits.is_relay_closed(id)),
+            )
+
+        _set("span_client_requests", (), labels, span_panel.request_count)
+        _set("span_client_retries", (), labels, span_panel.retry_count)
+        _set("span_client_errors", (), labels, span_panel.error_count)
+        _set("span_client_coalesced_requests", (), labels, span_panel.coalesced_count)
+
+        # Drop circuits that disappeared from the panel
+        for name in (
+            "span_circuit_power_watts",
+            "span_circuit_energy_watt_hours",
+            "span_circuit_relay_closed",
+        ):
+            changed |= families[name].prune(serial, seen.get(name, set()))
+
+        if changed:
+            self._buffer = None
+
+    def remove(self, serial: str) -> None:
+        """Drop every sample of a panel."""
+        if any([family.prune(serial) for family in self._families.values()]):
+            self._buffer = None
+
+    def render(self) -> bytes:
+        """Return the exposition."""
+        if self._buffer is None:
+            self._buffer = (
+                "".join(family.render() for family in self._families.values()) + "# EOF\n"
+            ).encode()
+        return self._buffer
@@ -0,0 +1,211 @@
+"""Rolling usage profiles by hour of the week.
+
+Each circuit, and the site load, has 168 hourly buckets (Monday 00:00 first)
+holding an exponentially weighted mean and variance of its power. Memory
+is fixed at a few kilobytes per circuit whatever the history length;
+older weeks fade out over PROFILE_WEEKS.
+"""
+from __future__ import annotations
+
+from array import array
+import base64
+from datetime import datetime
+import math
+import sys
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+BUCKETS = 7 * 24
+# Total consumption of all circuits. Unlike grid power it does not drop
+# (or go negative) when solar or a battery covers part of the load.
+SITE = "site"
+PROFILE_WEEKS = 4
+# Forecasts blend today's deviation from the profile into the profile,
+# halving its weight every this many hours
+FORECAST_HALF_LIFE = 1
+FORECAST_HOURS = 6
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 600
+_MAX_COUNT = 0xFFFF
+
+
+def bucket(when: datetime) -> int:
+    """Return the bucket of a local time."""
+    return when.weekday() * 24 + when.hour
+
+
+class UsageProfile:
+    """Mean and variance of power for each hour of the week."""
+
+    __slots__ = ("mean", "var", "count")
+
+    def __init__(self) -> None:
+        """Init an empty profile."""
+        self.mean = array("f", bytes(4 * BUCKETS))
+        self.var = array("f", bytes(4 * BUCKETS))
+        self.count = array("H", bytes(2 * BUCKETS))
+
+    def add(self, index: int, value: float, alpha: float) -> None:
+        """Fold a sample into a bucket.
+
+        Until a bucket has seen 1/alpha samples this is the exact running
+        mean and variance; afterwards it is exponentially weighted.
+        """
+        count = self.count[index]
+        if count < _MAX_COUNT:
+            count = self.count[index] = count + 1
+        weight = max(alpha, 1 / count)
+        mean = self.mean[index]
+        diff = value - mean
+        increment = weight * diff
+        self.mean[index] = mean + increment
+        self.var[index] = (1 - weight) * (self.var[index] + diff * increment)
+
+    def expected(self, index: int) -> float | None:
+        """Return the mean of a bucket, or None if it has no samples."""
+        return self.mean[index] if self.count[index] else None
+
+    def stddev(self, index: int) -> float | None:
+        """Return the standard deviation of a bucket."""
+        return math.sqrt(self.var[index]) if self.count[index] else None
+
+    def to_bytes(self) -> bytes:
+        """Return the profile as little endian bytes."""
+        arrays = [array(a.typecode, a) for a in (self.mean, self.var, self.count)]
+        if sys.byteorder == "big":
+            for a in arrays:
+                a.byteswap()
+        return b"".join(a.tobytes() for a in arrays)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> UsageProfile:
+        """Rebuild a profile from to_bytes()."""
+        profile = cls()
+        offset = 0
+        for a in (profile.mean, profile.var, profile.count):
+            size = a.itemsize * BUCKETS
+            a[:] = array(a.typecode, data[offset : offset + size])
+            if sys.byteorder == "big":
+                a.byteswap()
+            offset += size
+        return profile
+
+
+class SpanPanelProfiles:
+    """Usage profiles of every circuit of a panel and of its site load."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: DataUpdateCoordinator,
+        interval: float,
+    ):
+        """Init the profiles for samples taken every interval seconds."""
+        self.coordinator = coordinator
+        self.profiles: dict[str, UsageProfile] = {}
+        # Each bucket is visited for an hour once a week
+        self._alpha = interval / (3600 * PROFILE_WEEKS)
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.profiles")
+        self._bucket = 0
+        self._load = 0.0
+        self._save_scheduled = False
+
+    async def async_load(self) -> None:
+        """Restore the saved profiles."""
+        if (data := await self._store.async_load()) is None:
+            return
+        self.profiles = {
+            key: UsageProfile.from_bytes(base64.b64decode(encoded))
+            for key, encoded in data["profiles"].items()
+        }
+
+    def _data_to_save(self) -> dict:
+        # Called by the store when it writes
+        self._save_scheduled = False
+        return {
+            "profiles": {
+                key: base64.b64encode(profile.to_bytes()).decode()
+                for key, profile in self.profiles.items()
+            }
+        }
+
+    async def async_save(self) -> None:
+        """Write the profiles now."""
+        await self._store.async_save(self._data_to_save())
+
+    def _add(self, key: str, index: int, value: float) -> None:
+        if (profile := self.profiles.get(key)) is None:
+            profile = self.profiles[key] = UsageProfile()
+        profile.add(index, value, self._alpha)
+
+    @callback
+    def async_sample(self) -> None:
+        """Fold the latest snapshot into the profiles."""
+        if not self.coordinator.last_update_success:
+            return
+
+        snapshot = self.coordinator.data.snapshot
+        when = dt_util.as_local(dt_util.utc_from_timestamp(snapshot.sample_time))
+        index = self._bucket = bucket(when)
+        load = 0.0
+        for id, circuit in snapshot.circuits.items():
+            power = circuit.instant_power_w
+            self._add(id, index, abs(power))
+            # Circuits report consumption as negative power
+            if power < 0:
+                load -= power
+        self._load = load
+        self._add(SITE, index, load)
+
+        if len(self.profiles) > len(snapshot.circuits) + 1:
+            for key in self.profiles.keys() - snapshot.circuits.keys() - {SITE}:
+                del self.profiles[key]
+
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @property
+    def hour(self) -> int:
+        """Return the bucket of the latest snapshot."""
+        return self._bucket
+
+    def baseline(self, key: str, index: int, min_samples: float) -> float | None:
+        """Return the mean of a bucket once it holds min_samples samples."""
+        if (profile := self.profiles.get(key)) is None or profile.count[index] < min_samples:
+            return None
+        return profile.mean[index]
+
+    def expected(self, key: str, when: datetime | None = None) -> float | None:
+        """Return the usual power of a circuit (or SITE) at a local time."""
+        if (profile := self.profiles.get(key)) is None:
+            return None
+        return profile.expected(self._bucket if when is None else bucket(when))
+
+    def forecast(self, hours: int = FORECAST_HOURS) -> list[float | None]:
+        """Return the expected site load for each of the next hours.
+
+        The current deviation from the profile is carried forward, fading
+        with FORECAST_HALF_LIFE, so a busy day stays busy for a while.
+        """
+        if (profile := self.profiles.get(SITE)) is None:
+            return [None] * hours
+        now = profile.expected(self._bucket)
+        deviation = 0.0 if now is None else self._load - now
+        forecast = []
+        for hour in range(1, hours + 1):
+            expected = profile.expected((self._bucket + hour) % BUCKETS)
+            forecast.append(
+                None
+                if expected is None
+                else expected + deviation * 0.5 ** (hour / FORECAST_HALF_LIFE)
+            )
+        return forecast
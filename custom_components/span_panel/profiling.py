@@ -0,0 +1,106 @@
+"""Opt-in timing of the integration's hot paths.
+
+Hooks in SpanPanel and the coordinator only check whether a Profiler is
+attached, so nothing is measured (or allocated) while profiling is off.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import contextmanager
+import io
+import time
+
+# Phases, in the order they are reported
+QUEUE = "queue"
+NETWORK = "network"
+DECODE = "decode"
+UPDATE = "update"
+FANOUT = "fanout"
+PHASES = (QUEUE, NETWORK, DECODE, UPDATE, FANOUT)
+
+
+class Profiler:
+    """Per-phase timings plus an optional cProfile of the event loop thread."""
+
+    def __init__(self, cprofile: bool = False):
+        """Init the profiler."""
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self._cprofile = None
+        if cprofile:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+        self._started = 0.0
+        self.elapsed = 0.0
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Record one measurement of a phase."""
+        self.timings[phase].append(seconds)
+
+    @contextmanager
+    def phase(self, phase: str):
+        """Time the enclosed block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase].append(time.perf_counter() - start)
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        """Return func, timed as phase."""
+
+        def timed(*args, **kwargs):
+            with self.phase(phase):
+                return func(*args, **kwargs)
+
+        return timed
+
+    def start(self) -> None:
+        """Start the wall clock and cProfile."""
+        self._started = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        """Stop the wall clock and cProfile."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.elapsed = time.perf_counter() - self._started
+
+    def report(self) -> str:
+        """Return the per-phase breakdown as a table."""
+        lines = [
+            f"Profiled {self.elapsed:.1f} s",
+            f"{'phase':<10}{'count':>8}{'total ms':>12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}",
+        ]
+        for phase in sorted(self.timings, key=lambda p: (PHASES + (p,)).index(p)):
+            samples = sorted(self.timings[phase])
+            total = sum(samples)
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            lines.append(
+                f"{phase:<10}{len(samples):>8}{total * 1000:>12.1f}"
+                f"{total / len(samples) * 1000:>10.2f}{p95 * 1000:>10.2f}"
+                f"{samples[-1] * 1000:>10.2f}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> list[str]:
+        """Write the report (and the cProfile stats) next to path.
+
+        Returns the files written. Does blocking I/O.
+        """
+        written = [f"{path}.txt"]
+        with open(written[0], "w", encoding="utf-8") as file:
+            file.write(self.report())
+            if self._cprofile is not None:
+                import pstats
+
+                stream = io.StringIO()
+                stats = pstats.Stats(self._cprofile, stream=stream)
+                stats.sort_stats("cumulative").print_stats(50)
+                file.write("\n" + stream.getvalue())
+        if self._cprofile is not None:
+            written.append(f"{path}.prof")
+            self._cprofile.dump_stats(written[1])
+        return written
@@ -0,0 +1,187 @@
+"""Caching proxy in front of a Span Panel.
+
+The proxy polls the panel once per interval and serves the latest
+/status, /panel and /circuits (or /spaces) bodies to any number of local
+clients, with ETag/Last-Modified validators and Cache-Control headers.
+Relay and priority commands are checked and sent through the client's
+command methods, so they are rate limited and tracked like any other;
+any other POST is refused.
+"""
+from __future__ import annotations
+
+import asyncio
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
+import logging
+import time
+
+from aiohttp import web
+import httpx
+
+from .models import DecodeError
+from .openmetrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, OpenMetricsExporter
+from .span_panel import (
+    CIRCUITS_PRIORITIES,
+    CIRCUITS_RELAY_CLOSED,
+    CIRCUITS_RELAY_OPEN,
+    SpanPanel,
+)
+
+DEFAULT_INTERVAL = 5.0
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Cached:
+    """Latest body of one endpoint and its validators."""
+
+    __slots__ = ("body", "content_type", "etag", "last_modified", "modified_at")
+
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.modified_at = int(time.time())
+        self.last_modified = formatdate(self.modified_at, usegmt=True)
+
+
+class SpanPanelProxy:
+    """Poll a panel once and serve its data to local clients."""
+
+    def __init__(self, span_panel: SpanPanel, interval: float = DEFAULT_INTERVAL):
+        """Init the proxy."""
+        self.span_panel = span_panel
+        self.interval = interval
+        self.exporter = OpenMetricsExporter()
+        self._cache: dict[str, _Cached] = {}
+        self._poll_task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def _store(self, name: str, response: httpx.Response) -> None:
+        body = response.content
+        current = self._cache.get(name)
+        if current is None or current.body != body:
+            self._cache[name] = _Cached(
+                body, response.headers.get("content-type", "application/json")
+            )
+
+    async def async_poll(self) -> None:
+        """Fetch every endpoint once and update the cache."""
+        span_panel = self.span_panel
+        await span_panel.async_snapshot()
+        self._store("status", span_panel.status_results)
+        self._store("panel", span_panel.panel_results)
+        self._store("circuits", span_panel.circuits.circuits_results)
+        self.exporter.update(span_panel)
+
+    async def _async_poll_loop(self) -> None:
+        while True:
+            try:
+                await self.async_poll()
+            except (httpx.HTTPError, DecodeError) as err:
+                _LOGGER.warning("Polling %s failed: %s", self.span_panel.host, err)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _not_modified(self, request: web.Request, cached: _Cached) -> bool:
+        if (etags := request.headers.get("If-None-Match")) is not None:
+            tags = {tag.strip() for tag in etags.split(",")}
+            return cached.etag in tags or "*" in tags
+        if (since := request.headers.get("If-Modified-Since")) is not None:
+            try:
+                return cached.modified_at <= parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _get(self, name: str):
+        async def handler(request: web.Request) -> web.Response:
+            return self._serve(request, name)
+
+        return handler
+
+    def _serve(self, request: web.Request, name: str) -> web.Response:
+        if (cached := self._cache.get(name)) is None:
+            raise web.HTTPServiceUnavailable(reason="No data from the panel yet")
+
+        headers = {
+            "ETag": cached.etag,
+            "Last-Modified": cached.last_modified,
+            "Cache-Control": f"max-age={int(self.interval)}",
+        }
+        if self._not_modified(request, cached):
+            return web.Response(status=304, headers=headers)
+        headers["Content-Type"] = cached.content_type
+        return web.Response(body=cached.body, headers=headers)
+
+    async def _post(self, request: web.Request) -> web.Response:
+        try:
+            payload = await request.json()
+        except ValueError as err:
+            raise web.HTTPBadRequest(reason="Body is not JSON") from err
+        command = self._command(payload)
+
+        try:
+            response = await command(request.match_info["id"])
+        except httpx.HTTPStatusError as err:
+            # Pass on the panel's refusal, e.g. of a circuit that is not
+            # user controllable
+            response = err.response
+        except httpx.HTTPError as err:
+            raise web.HTTPBadGateway(reason=str(err)) from err
+
+        # Serve the effect of the command as soon as possible
+        self._wakeup.set()
+        content_type = response.headers.get("content-type", "application/json")
+        return web.Response(
+            status=response.status_code,
+            body=response.content,
+            headers={"Content-Type": content_type},
+        )
+
+    def _command(self, payload):
+        """Return the circuit command a POST body asks for."""
+        circuits = self.span_panel.circuits
+        if isinstance(payload, dict) and len(payload) == 1:
+            ((name, body),) = payload.items()
+            if isinstance(body, dict) and len(body) == 1:
+                ((key, value),) = body.items()
+                if (name, key) == ("relay_state_in", "relayState"):
+                    if value == CIRCUITS_RELAY_OPEN:
+                        return circuits.set_relay_open
+                    if value == CIRCUITS_RELAY_CLOSED:
+                        return circuits.set_relay_closed
+                elif (name, key) == ("priority_in", "priority"):
+                    if value in CIRCUITS_PRIORITIES:
+                        return lambda id: circuits.set_priority(id, value)
+        raise web.HTTPBadRequest(reason="Expected a relay_state_in or priority_in command")
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.exporter.render(), headers={"Content-Type": METRICS_CONTENT_TYPE}
+        )
+
+    def make_app(self) -> web.Application:
+        """Return the aiohttp application serving the proxy."""
+        app = web.Application()
+        app.router.add_get("/api/v1/status", self._get("status"))
+        app.router.add_get("/api/v1/panel", self._get("panel"))
+        # Serve the circuits under both names whatever the firmware uses
+        app.router.add_get("/api/v1/circuits", self._get("circuits"))
+        app.router.add_get("/api/v1/spaces", self._get("circuits"))
+        app.router.add_post("/api/v1/circuits/{id}", self._post)
+        app.router.add_post("/api/v1/spaces/{id}", self._post)
+        app.router.add_get("/metrics", self._metrics)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._poll_task = asyncio.create_task(self._async_poll_loop())
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
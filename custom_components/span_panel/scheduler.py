@@ -0,0 +1,178 @@
+"""Per-host request scheduling for the Span Panel API.
+
+The panel's embedded web server returns 500 errors when it receives bursts
+of requests. Every request to a host goes through one RequestScheduler,
+which limits concurrency and the request rate, serves waiting requests
+in priority order and lets identical concurrent GETs share one response
+(optionally cached for a short time).
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+import time
+from typing import TypeVar
+import weakref
+
+_T = TypeVar("_T")
+
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+PRIORITY_DIAGNOSTIC = 2
+
+DEFAULT_RATE = 4.0
+DEFAULT_BURST = 4
+DEFAULT_MAX_CONCURRENT = 2
+
+
+class RequestScheduler:
+    """Token bucket rate limiter with a priority queue."""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+    ):
+        """Init the scheduler."""
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._active = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._recent: dict[str, tuple[float, object]] = {}
+        self._generation = 0
+        self.coalesced_count = 0
+
+    @property
+    def queued(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return sum(1 for _, _, waiter in self._queue if not waiter.done())
+
+    async def shared(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[_T]],
+        ttl: float = 0,
+    ) -> _T:
+        """Run factory() unless a call with the same key is already in flight.
+
+        Every caller awaiting the same key gets the same result (or
+        exception). A caller being cancelled does not cancel the request for
+        the others. With a ttl, a successful result is also handed to callers
+        arriving up to ttl seconds after it completed.
+        """
+        if ttl > 0 and (cached := self._recent.get(key)) is not None:
+            expires, result = cached
+            if time.monotonic() < expires:
+                self.coalesced_count += 1
+                return result
+            del self._recent[key]
+
+        if (pending := self._inflight.get(key)) is not None:
+            self.coalesced_count += 1
+        else:
+            pending = asyncio.ensure_future(factory())
+            self._inflight[key] = pending
+            generation = self._generation
+            pending.add_done_callback(
+                lambda done: self._completed(key, done, ttl, generation)
+            )
+        return await asyncio.shield(pending)
+
+    def _completed(
+        self, key: str, done: asyncio.Future, ttl: float, generation: int
+    ) -> None:
+        if self._inflight.get(key) is done:
+            # After invalidate() the key may belong to a newer request
+            del self._inflight[key]
+        if ttl <= 0 or generation != self._generation:
+            return
+        if not done.cancelled() and done.exception() is None:
+            self._recent[key] = (time.monotonic() + ttl, done.result())
+
+    def invalidate(self) -> None:
+        """Drop cached results, e.g. after a command changed panel state.
+
+        Requests already in flight may have been answered before the change,
+        so they are detached too: their callers still get their results, but
+        later callers send a new request.
+        """
+        self._generation += 1
+        self._recent.clear()
+        self._inflight.clear()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_POLL):
+        """Wait for a request slot and hold it for the duration of the block."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: int) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), waiter))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was granted just as we were cancelled; hand it back.
+                self._active -= 1
+                self._dispatch()
+            raise
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _dispatch(self) -> None:
+        self._refill()
+        while self._queue and self._active < self.max_concurrent:
+            if self._queue[0][2].done():
+                # Cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self._tokens < 1:
+                self._schedule_wakeup()
+                return
+            _, _, waiter = heapq.heappop(self._queue)
+            self._tokens -= 1
+            self._active += 1
+            waiter.set_result(None)
+
+    def _schedule_wakeup(self) -> None:
+        if self._timer is not None:
+            return
+        delay = (1 - self._tokens) / self.rate
+        self._timer = asyncio.get_running_loop().call_later(delay, self._wakeup)
+
+    def _wakeup(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+
+# Held weakly, so a host's scheduler goes away with its last client, like the
+# throwaway clients a config flow creates to probe a network
+_SCHEDULERS: weakref.WeakValueDictionary[str, RequestScheduler] = (
+    weakref.WeakValueDictionary()
+)
+
+
+def get_scheduler(host: str) -> RequestScheduler:
+    """Return the scheduler shared by every client talking to a host."""
+    if (scheduler := _SCHEDULERS.get(host)) is None:
+        scheduler = _SCHEDULERS[host] = RequestScheduler()
+    return scheduler
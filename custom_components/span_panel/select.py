@@ -1,22 +1,20 @@
 """Control switches."""
-from datetime import timedelta
 import logging
 
-from .span_panel import SpanPanel, CIRCUITS_POWER, CIRCUITS_ENERGY_PRODUCED, CIRCUITS_ENERGY_CONSUMED
-import async_timeout
+import httpx
 
-from homeassistant.components.select import SelectEntity, SelectEntityDescription
+from .span_panel import SpanPanel
+
+from homeassistant.components.select import SelectEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-)
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from .const import COORDINATOR, DOMAIN
-from .util import panel_to_device_info
+from .entity import SpanPanelCircuitEntity
+from .topology import async_add_circuit_entities
 
 ICON = "mdi:toggle-switch"
 
@@ -30,7 +28,7 @@ PRIORITY_TO_HASS = {
 }
 HASS_TO_PRIORITY = {v: k for k, v in PRIORITY_TO_HASS.items()}
 
-class SpanPanelCircuitsSelect(CoordinatorEntity, SelectEntity):
+class SpanPanelCircuitsSelect(SpanPanelCircuitEntity, SelectEntity):
     """Represent a switch entity."""
 
     _attr_options = list(PRIORITY_TO_HASS.values())
@@ -39,16 +37,10 @@ class SpanPanelCircuitsSelect(CoordinatorEntity, SelectEntity):
         self,
         coordinator: DataUpdateCoordinator,
         id: str,
-        name: str,
     ) -> None:
         """Initialize the values."""
-        _LOGGER.debug("CREATE SELECT %s" % name)
-        span_panel: SpanPanel = coordinator.data
-
-        self.id = id
-        self._attr_unique_id = f"span_{span_panel.serial_number}_select_{id}"
-        self._attr_device_info = panel_to_device_info(span_panel)
-        super().__init__(coordinator)
+        super().__init__(coordinator, id, f"select_{id}", "Circuit Priority")
+        _LOGGER.debug("CREATE SELECT %s", self._attr_name)
 
     @property
     def current_option(self) -> str:
@@ -59,17 +51,15 @@ class SpanPanelCircuitsSelect(CoordinatorEntity, SelectEntity):
 
     async def async_select_option(self, option: str) -> None:
         """Set the option."""
-        _LOGGER.debug("SELECT - set option [%s] [%s]" % (option, HASS_TO_PRIORITY[option]))
+        _LOGGER.debug("SELECT - set option [%s] [%s]", option, HASS_TO_PRIORITY[option])
         span_panel: SpanPanel = self.coordinator.data
         priority = HASS_TO_PRIORITY[option]
-        await span_panel.circuits.set_priority(self.id, priority)
-
-
-    @property
-    def name(self):
-        """Return the switch name."""
-        span_panel: SpanPanel = self.coordinator.data
-        return f"{span_panel.circuits.name(self.id)} Circuit Priority"
+        try:
+            await span_panel.circuits.set_priority(self.id, priority)
+        except httpx.HTTPError as err:
+            raise HomeAssistantError(f"Could not set {self.name}: {err}") from err
+        # Confirms the change, and times it
+        await self.coordinator.async_request_refresh()
 
 
 async def async_setup_entry(
@@ -83,16 +73,14 @@ async def async_setup_entry(
     data: dict = hass.data[DOMAIN][config_entry.entry_id]
 
     coordinator: DataUpdateCoordinator = data[COORDINATOR]
-    span_panel: SpanPanel = coordinator.data
-    serial_number: str = config_entry.unique_id
-
-    entities: list[SpanPanelCircuitsSwitch] = []
 
-    for id in span_panel.circuits.keys():
-       if span_panel.circuits.is_user_controllable(id):
-          name = span_panel.circuits.name(id)
-          entities.append(
-             SpanPanelCircuitsSelect(coordinator, id, name)
-          )
+    def create_entities(circuits):
+        return [
+            SpanPanelCircuitsSelect(coordinator, circuit.id)
+            for circuit in circuits
+            if circuit.user_controllable
+        ]
 
-    async_add_entities(entities)
+    async_add_circuit_entities(
+        hass, config_entry, async_add_entities, create_entities
+    )
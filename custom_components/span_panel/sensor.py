@@ -3,11 +3,11 @@ from __future__ import annotations
 
 from collections.abc import Callable
 from dataclasses import dataclass
-import datetime
 import logging
+import time
 from typing import cast
 
-from .span_panel import CIRCUITS_POWER, CIRCUITS_ENERGY_PRODUCED, CIRCUITS_ENERGY_CONSUMED
+from .span_panel import SpanPanel, CIRCUITS_POWER, CIRCUITS_ENERGY_PRODUCED, CIRCUITS_ENERGY_CONSUMED, CIRCUITS_PRIORITIES
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -16,17 +16,26 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import POWER_WATT, ENERGY_WATT_HOUR
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.const import POWER_WATT, ENERGY_WATT_HOUR, TIME_SECONDS
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .const import (
+    CONF_STATE_INTERVAL,
+    CONF_STATISTICS,
+    COORDINATOR,
+    COSTS,
+    DEFAULT_STATE_INTERVAL,
+    DEFAULT_STATISTICS,
+    DOMAIN,
+    PROFILES,
 )
-
-from .const import COORDINATOR, DOMAIN
-from .util import panel_to_device_info
+from .cost import MAINS, SpanPanelCosts
+from .entity import SpanPanelCircuitEntity, SpanPanelEntity
+from .profiles import SITE, SpanPanelProfiles
+from .topology import async_add_circuit_entities
 
 @dataclass
 class SpanPanelCircuitsRequiredKeysMixin:
@@ -40,6 +49,18 @@ class SpanPanelCircuitsSensorEntityDescription(SensorEntityDescription, SpanPane
     """Describes an SpanPanelCircuits inverter sensor entity."""
 
 
+@dataclass
+class SpanPanelDataRequiredKeysMixin:
+    """Mixin for required keys."""
+
+    value_fn: Callable[[SpanPanel], float]
+
+
+@dataclass
+class SpanPanelDataSensorEntityDescription(SensorEntityDescription, SpanPanelDataRequiredKeysMixin):
+    """Describes a Span Panel mains sensor entity."""
+
+
 CIRCUITS_SENSORS = (
     SpanPanelCircuitsSensorEntityDescription(
         key=CIRCUITS_POWER,
@@ -68,54 +89,89 @@ CIRCUITS_SENSORS = (
 )
 
 PANEL_SENSORS = (
-    SensorEntityDescription(
+    SpanPanelDataSensorEntityDescription(
         key="instantGridPowerW",
         name="Current Power",
         native_unit_of_measurement=POWER_WATT,
         device_class=SensorDeviceClass.POWER,
         state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda span_panel: span_panel.panel_data.instant_grid_power_w,
     ),
-    SensorEntityDescription(
+    SpanPanelDataSensorEntityDescription(
         key="feedthroughPowerW",
         name="Feed Through Power",
         native_unit_of_measurement=POWER_WATT,
         device_class=SensorDeviceClass.POWER,
         state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda span_panel: span_panel.panel_data.feedthrough_power_w,
     ),
-    SensorEntityDescription(
+    SpanPanelDataSensorEntityDescription(
         key="mainMeterEnergy.producedEnergyWh",
         name="Main Meter Produced Energy",
         native_unit_of_measurement=ENERGY_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         device_class=SensorDeviceClass.ENERGY,
+        value_fn=lambda span_panel: span_panel.panel_data.main_meter_energy.produced_energy_wh,
     ),
-    SensorEntityDescription(
+    SpanPanelDataSensorEntityDescription(
         key="mainMeterEnergy.consumedEnergyWh",
         name="Main Meter Consumed Energy",
         native_unit_of_measurement=ENERGY_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         device_class=SensorDeviceClass.ENERGY,
+        value_fn=lambda span_panel: span_panel.panel_data.main_meter_energy.consumed_energy_wh,
     ),
-    SensorEntityDescription(
+    SpanPanelDataSensorEntityDescription(
         key="feedthroughEnergy.producedEnergyWh",
         name="Feed Through Produced Energy",
         native_unit_of_measurement=ENERGY_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         device_class=SensorDeviceClass.ENERGY,
+        value_fn=lambda span_panel: span_panel.panel_data.feedthrough_energy.produced_energy_wh,
     ),
-    SensorEntityDescription(
+    SpanPanelDataSensorEntityDescription(
         key="feedthroughEnergy.consumedEnergyWh",
         name="Feed Through Consumed Energy",
         native_unit_of_measurement=ENERGY_WATT_HOUR,
         state_class=SensorStateClass.TOTAL_INCREASING,
         device_class=SensorDeviceClass.ENERGY,
+        value_fn=lambda span_panel: span_panel.panel_data.feedthrough_energy.consumed_energy_wh,
+    ),
+    SpanPanelDataSensorEntityDescription(
+        key="commandLatencyP50",
+        name="Command Latency p50",
+        native_unit_of_measurement=TIME_SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda span_panel: span_panel.commands.latency(50),
+    ),
+    SpanPanelDataSensorEntityDescription(
+        key="commandLatencyP95",
+        name="Command Latency p95",
+        native_unit_of_measurement=TIME_SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda span_panel: span_panel.commands.latency(95),
+    ),
+    SpanPanelDataSensorEntityDescription(
+        key="sampleSkew",
+        name="Sample Skew",
+        native_unit_of_measurement=TIME_SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda span_panel: round(span_panel.snapshot.skew, 3),
     ),
 )
 
 ICON = "mdi:flash"
+
+# In statistics mode a circuit sensor writes its state early when the value
+# moved by at least this much (native units) and this fraction.
+SIGNIFICANT_CHANGE = 50
+SIGNIFICANT_CHANGE_RATIO = 0.1
 _LOGGER = logging.getLogger(__name__)
 
-class SpanPanelCircuitSensor(CoordinatorEntity, SensorEntity):
+class SpanPanelCircuitSensor(SpanPanelCircuitEntity, SensorEntity):
     """Envoy inverter entity."""
 
     _attr_icon = ICON
@@ -125,30 +181,72 @@ class SpanPanelCircuitSensor(CoordinatorEntity, SensorEntity):
         coordinator: DataUpdateCoordinator,
         description: SpanPanelCircuitsSensorEntityDescription,
         id: str,
-        name: str,
+        state_interval: float | None = None,
+        profiles: SpanPanelProfiles | None = None,
     ) -> None:
-        """Initialize Span Panel Circuit entity."""
-        span_panel: SpanPanel = coordinator.data
+        """Initialize Span Panel Circuit entity.
 
+        With profiles, the circuit's usual power at this hour of the week
+        is an attribute.
+        """
         self.entity_description = description
-        self.id = id
-        self._attr_name = f"{name} {description.name}"
-        self._attr_unique_id = f"span_{span_panel.serial_number}_{id}_{description.key}"
-        self._attr_device_info = panel_to_device_info(span_panel)
-
-        _LOGGER.debug("CREATE SENSOR [%s]" % self._attr_name)
-        super().__init__(coordinator)
+        self._state_interval = state_interval
+        self.profiles = profiles
+        if state_interval is not None:
+            # The hourly statistics are imported by long_term_statistics;
+            # the recorder compiling its own from the sparse states would
+            # add a second series that disagrees with them
+            self._attr_state_class = None
+        self._written_value: float | None = None
+        self._written_at = 0.0
+        super().__init__(coordinator, id, f"{id}_{description.key}", description.name)
+
+        _LOGGER.debug("CREATE SENSOR [%s]", self._attr_name)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state, or in statistics mode only when due."""
+        span_panel: SpanPanel = self.coordinator.data
+        if (
+            self._state_interval is not None
+            and self.id in span_panel.circuits.keys()
+            and not self._state_due()
+        ):
+            return
+        super()._handle_coordinator_update()
+
+    def _state_due(self) -> bool:
+        value = self.native_value
+        now = time.monotonic()
+        last = self._written_value
+        if (
+            last is None
+            or now - self._written_at >= self._state_interval
+            or abs(value - last) >= max(SIGNIFICANT_CHANGE, SIGNIFICANT_CHANGE_RATIO * abs(last))
+        ):
+            self._written_value = value
+            self._written_at = now
+            return True
+        return False
 
     @property
     def native_value(self) -> float | None:
         """Return the state of the sensor."""
         span_panel: SpanPanel = self.coordinator.data
         value = self.entity_description.value_fn(span_panel.circuits, self.id)
-        _LOGGER.debug("native_value:[%s] [%s]" % (self._attr_name, value))
+        _LOGGER.debug("native_value:[%s] [%s]", self._attr_name, value)
         return cast(float, value)
 
+    @property
+    def extra_state_attributes(self):
+        """Return the expected power of the circuit."""
+        if self.profiles is None:
+            return None
+        expected = self.profiles.expected(self.id)
+        return {"expected": None if expected is None else round(expected)}
+
 
-class SpanPanelPanel(CoordinatorEntity, SensorEntity):
+class SpanPanelPanel(SpanPanelEntity, SensorEntity):
     """Envoy inverter entity."""
 
     _attr_icon = ICON
@@ -156,35 +254,164 @@ class SpanPanelPanel(CoordinatorEntity, SensorEntity):
     def __init__(
         self,
         coordinator: DataUpdateCoordinator,
-        description: SensorEntityDescription,
+        description: SpanPanelDataSensorEntityDescription,
     ) -> None:
         """Initialize Span Panel Circuit entity."""
-        span_panel: SpanPanel = coordinator.data
-
         self.entity_description = description
-        self._attr_name = f"{description.name}"
-        self._attr_unique_id = f"span_{span_panel.serial_number}_{description.key}"
-        self._attr_device_info = panel_to_device_info(span_panel)
+        self._attr_name = description.name
+        super().__init__(coordinator, description.key)
 
-        _LOGGER.debug("CREATE SENSOR SPAN [%s]" % self._attr_name)
-        super().__init__(coordinator)
+        _LOGGER.debug("CREATE SENSOR SPAN [%s]", self._attr_name)
 
     @property
     def native_value(self) -> float | None:
         """Return the state of the sensor."""
-        key = self.entity_description.key.split(".")
         span_panel: SpanPanel = self.coordinator.data
-        panel = span_panel.panel_results.json()
-        # Most sensors are simple value = panel[key], but in order
-        # to support mainMeterEnergy.producedEnergyWh, we split the
-        # key by `.` and loop down through the value
-        value = panel
-        for k in key:
-            value = value[k]
-        _LOGGER.debug("NATIVE VALUE [%s] [%s]" % (key, value))
+        value = self.entity_description.value_fn(span_panel)
+        _LOGGER.debug("NATIVE VALUE [%s] [%s]", self.entity_description.key, value)
         return cast(float, value)
 
 
+class SpanPanelCircuitCostSensor(SpanPanelCircuitEntity, SensorEntity):
+    """Accumulated energy cost of a circuit."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_icon = "mdi:cash"
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        costs: SpanPanelCosts,
+        id: str,
+        currency: str,
+    ) -> None:
+        """Initialize the cost sensor."""
+        self.costs = costs
+        self._attr_native_unit_of_measurement = currency
+        self._written_available = True
+        super().__init__(coordinator, id, f"{id}_cost", "Cost")
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the cost, availability or circuit name changed."""
+        circuits = self.coordinator.data.circuits
+        if (
+            self.id not in self.costs.changed
+            and self.available == self._written_available
+            and self.id in circuits.keys()
+            and circuits.name(self.id) == self._circuit_name
+        ):
+            return
+        self._written_available = self.available
+        super()._handle_coordinator_update()
+
+    @property
+    def native_value(self) -> float:
+        """Return the cost so far."""
+        return round(self.costs.circuits.get(self.id, 0.0), 4)
+
+
+class SpanPanelCostSensor(SpanPanelEntity, SensorEntity):
+    """Accumulated energy cost of the mains or of a priority tier."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_icon = "mdi:cash"
+
+    def __init__(
+        self,
+        coordinator: DataUpdateCoordinator,
+        costs: SpanPanelCosts,
+        key: str,
+        currency: str,
+    ) -> None:
+        """Initialize the cost sensor; key is MAINS or a priority."""
+        self.costs = costs
+        self._key = key
+        self._attr_name = f"{key.replace('_', ' ').title()} Cost"
+        self._attr_native_unit_of_measurement = currency
+        self._written_available = True
+        super().__init__(coordinator, f"cost_{key.lower()}")
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the cost or availability changed."""
+        # Nothing changes when a refresh fails, but the sensor goes unavailable
+        if self._key in self.costs.changed or self.available != self._written_available:
+            self._written_available = self.available
+            super()._handle_coordinator_update()
+
+    @property
+    def native_value(self) -> float:
+        """Return the cost so far."""
+        if self._key == MAINS:
+            return round(self.costs.mains, 4)
+        return round(self.costs.tiers.get(self._key, 0.0), 4)
+
+
+class SpanPanelExpectedLoadSensor(SpanPanelEntity, SensorEntity):
+    """Usual site load at this hour of the week."""
+
+    _attr_name = "Expected Load"
+    _attr_native_unit_of_measurement = POWER_WATT
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:chart-bell-curve"
+
+    def __init__(self, coordinator: DataUpdateCoordinator, profiles: SpanPanelProfiles) -> None:
+        """Initialize the sensor."""
+        self.profiles = profiles
+        super().__init__(coordinator, "expected_load")
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the expected power."""
+        if (expected := self.profiles.expected(SITE)) is None:
+            return None
+        return round(expected)
+
+
+class SpanPanelForecastLoadSensor(SpanPanelEntity, SensorEntity):
+    """Forecast site load for the next hour, with the hours after it."""
+
+    _attr_name = "Forecast Load"
+    _attr_native_unit_of_measurement = POWER_WATT
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_icon = "mdi:chart-timeline-variant"
+
+    def __init__(self, coordinator: DataUpdateCoordinator, profiles: SpanPanelProfiles) -> None:
+        """Initialize the sensor."""
+        self.profiles = profiles
+        self._forecast: list[float | None] = []
+        super().__init__(coordinator, "forecast_load")
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Compute the forecast once per refresh."""
+        self._forecast = self.profiles.forecast()
+        super()._handle_coordinator_update()
+
+    async def async_added_to_hass(self) -> None:
+        """Compute the first forecast."""
+        self._forecast = self.profiles.forecast()
+        await super().async_added_to_hass()
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the forecast for the next hour."""
+        if not self._forecast or self._forecast[0] is None:
+            return None
+        return round(self._forecast[0])
+
+    @property
+    def extra_state_attributes(self):
+        """Return the forecast of each coming hour."""
+        return {
+            "hourly": [None if value is None else round(value) for value in self._forecast]
+        }
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: ConfigEntry,
@@ -194,27 +421,56 @@ async def async_setup_entry(
 
     _LOGGER.debug("ASYNC SETUP ENTRY SENSOR")
     data: dict = hass.data[DOMAIN][config_entry.entry_id]
-    _LOGGER.debug("  config_entry: %s" % config_entry)
-    _LOGGER.debug("  config_entry(uid): %s" % config_entry.unique_id)
-    _LOGGER.debug("  data: %s" % data)
+    _LOGGER.debug("  config_entry: %s", config_entry)
+    _LOGGER.debug("  config_entry(uid): %s", config_entry.unique_id)
 
     coordinator: DataUpdateCoordinator = data[COORDINATOR]
-    span_panel: SpanPanel = coordinator.data
 
-    entities: list[SpanPanelCircuitSensor | SpanPanelPanel] = []
-
-    keys = ["7ef7a4091cdd4910a582b35b40768598"]
-
-    for description in CIRCUITS_SENSORS:
-        for id in span_panel.circuits.keys():
-           name = span_panel.circuits.name(id)
-           entities.append(
-              SpanPanelCircuitSensor(coordinator, description, id, name)
-           )
+    state_interval = None
+    if config_entry.options.get(CONF_STATISTICS, DEFAULT_STATISTICS):
+        state_interval = config_entry.options.get(
+            CONF_STATE_INTERVAL, DEFAULT_STATE_INTERVAL
+        )
 
-    for description in PANEL_SENSORS:
-        entities.append(
-           SpanPanelPanel(coordinator, description)
+    costs: SpanPanelCosts | None = data[COSTS]
+    currency = hass.config.currency
+    panel_entities = [
+        SpanPanelPanel(coordinator, description) for description in PANEL_SENSORS
+    ]
+    profiles: SpanPanelProfiles = data[PROFILES]
+    panel_entities.append(SpanPanelExpectedLoadSensor(coordinator, profiles))
+    panel_entities.append(SpanPanelForecastLoadSensor(coordinator, profiles))
+    if costs is not None:
+        # Every tier a circuit can be moved to, not just those in use now,
+        # so moving one into a new tier needs no reload
+        panel_entities.extend(
+            SpanPanelCostSensor(coordinator, costs, key, currency)
+            for key in (MAINS, *sorted(set(CIRCUITS_PRIORITIES) | costs.tiers.keys()))
         )
 
-    async_add_entities(entities)
+    def create_entities(circuits):
+        entities = [
+            SpanPanelCircuitSensor(
+                coordinator,
+                description,
+                circuit.id,
+                state_interval,
+                profiles if description.key == CIRCUITS_POWER else None,
+            )
+            for description in CIRCUITS_SENSORS
+            for circuit in circuits
+        ]
+        if costs is not None:
+            entities.extend(
+                SpanPanelCircuitCostSensor(coordinator, costs, circuit.id, currency)
+                for circuit in circuits
+            )
+        return entities
+
+    async_add_circuit_entities(
+        hass,
+        config_entry,
+        async_add_entities,
+        create_entities,
+        panel_entities,
+    )
@@ -0,0 +1,95 @@
+"""Services for the Span Panel integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import COORDINATOR, DOMAIN
+from .profiling import Profiler
+
+SERVICE_PROFILE = "profile"
+ATTR_DURATION = "duration"
+ATTR_CPROFILE = "cprofile"
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=600)
+        ),
+        vol.Optional(ATTR_CPROFILE, default=False): cv.boolean,
+    }
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services once."""
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        return
+
+    # Profiles attach to every panel, so only one may run at a time
+    running: asyncio.Task | None = None
+
+    async def _async_profile(call: ServiceCall) -> None:
+        """Start a profile; its report arrives as a notification when done."""
+        nonlocal running
+        if running is not None and not running.done():
+            raise HomeAssistantError("A Span Panel profile is already running")
+
+        profiler = Profiler(cprofile=call.data[ATTR_CPROFILE])
+        try:
+            profiler.start()
+        except ValueError as err:
+            # Another cProfile, e.g. the profiler integration's, is active
+            raise HomeAssistantError(f"Cannot start cProfile: {err}") from err
+        running = hass.async_create_task(
+            _async_run_profile(hass, profiler, call.data[ATTR_DURATION])
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, _async_profile, schema=PROFILE_SCHEMA
+    )
+
+
+async def _async_run_profile(hass: HomeAssistant, profiler: Profiler, duration: float) -> None:
+    """Profile every panel for duration seconds and report the result."""
+    panels = [data[COORDINATOR].data for data in hass.data.get(DOMAIN, {}).values()]
+    try:
+        # The client and SpanPanelCoordinator time themselves while attached
+        for span_panel in panels:
+            span_panel.profiler = profiler
+        await asyncio.sleep(duration)
+    finally:
+        profiler.stop()
+        for span_panel in panels:
+            span_panel.profiler = None
+
+    path = hass.config.path(
+        f"span_panel_profile_{dt_util.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    )
+    written = await hass.async_add_executor_job(profiler.dump, path)
+    report = profiler.report()
+    _LOGGER.info("Span Panel profile written to %s:\n%s", written, report)
+    persistent_notification.async_create(
+        hass,
+        f"Written to {', '.join(written)}\n\n```\n{report}```",
+        title="Span Panel profile",
+        notification_id=f"{DOMAIN}_{SERVICE_PROFILE}",
+    )
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the integration's services once its last entry is unloaded."""
+    if not hass.data.get(DOMAIN):
+        hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
@@ -0,0 +1,286 @@
+"""Load shedding controller for the Span Panel integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import math
+import time
+
+import httpx
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .models import DecodeError
+from .span_panel import TIMING, SpanPanel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Circuits are shed tier by tier, lowest tier first. Anything not listed
+# here (MUST_HAVE) is never touched by the shedder.
+SHED_TIERS = {
+    "NOT_ESSENTIAL": 0,
+    "NON_ESSENTIAL": 0,
+    "NICE_TO_HAVE": 1,
+}
+
+# After shedding, no more circuits are shed until a sample shows at least
+# SETTLE_FRACTION of the shed load gone, or SETTLE_TIME seconds have passed
+SETTLE_FRACTION = 0.5
+SETTLE_TIME = 10.0
+
+# A restore the panel rejects is retried after RESTORE_BACKOFF seconds,
+# doubling on each failure up to RESTORE_MAX_BACKOFF
+RESTORE_BACKOFF = 5.0
+RESTORE_MAX_BACKOFF = 300.0
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 1
+
+
+def _store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.shedding")
+
+
+async def async_release(hass: HomeAssistant, entry: ConfigEntry, span_panel: SpanPanel) -> None:
+    """Close the circuits a shedder left open, when shedding is now off."""
+    store = _store(hass, entry)
+    if not (data := await store.async_load()) or not data["shed"]:
+        return
+    _LOGGER.info("Closing circuits left shed: %s", list(data["shed"]))
+    circuits = span_panel.circuits
+    ids = [id for id in data["shed"] if id in circuits.circuit_data]
+    results = await asyncio.gather(
+        *(circuits.set_relay_closed(id) for id in ids), return_exceptions=True
+    )
+    failed = {id: data["shed"][id] for id, result in zip(ids, results) if result is not None}
+    await store.async_save({"shed": failed})
+
+
+class SpanPanelLoadShedder:
+    """Open low priority circuits while grid power is above a limit.
+
+    Mains power is sampled on a fast path (only /panel is fetched) so the
+    controller reacts within a sample interval instead of waiting for the
+    coordinator. The sample is not stored, so it never mixes into the
+    coordinator's snapshot. Per circuit power and priority come from the
+    last coordinator refresh.
+
+    The shed circuits are saved, so circuits still shed when Home Assistant
+    stops are taken back under control at the next start.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        span_panel: SpanPanel,
+        limit: float,
+        hysteresis: float,
+        min_off_time: float,
+        min_on_time: float,
+        on_change: Callable[[], Awaitable[None]] | None = None,
+    ):
+        """Init the shedder."""
+        self.span_panel = span_panel
+        self.limit = limit
+        self.hysteresis = hysteresis
+        self.min_off_time = min_off_time
+        self.min_on_time = min_on_time
+        self._on_change = on_change
+        # id -> (time opened, circuit power when opened, wall time the
+        # panel accepted the command), in shed order
+        self._shed: dict[str, tuple[float, float, float]] = {}
+        self._last_closed: dict[str, float] = {}
+        # (grid power before, power shed, deadline) of the last shed batch
+        self._settling: tuple[float, float, float] | None = None
+        # id -> (failed restores, time of the next attempt)
+        self._restore_failures: dict[str, tuple[int, float]] = {}
+        self._lock = asyncio.Lock()
+        self._store = _store(hass, entry)
+
+    @property
+    def shed_circuits(self) -> list[str]:
+        """Return the ids of the circuits currently held open, in shed order."""
+        return list(self._shed)
+
+    async def async_load(self) -> None:
+        """Take back the circuits that were shed when Home Assistant stopped."""
+        if not (data := await self._store.async_load()):
+            return
+        circuits = self.span_panel.circuits
+        now = time.monotonic()
+        for id, power in data["shed"].items():
+            # Circuits closed since, by hand or by the panel, are let go
+            if id in circuits.circuit_data and circuits.is_relay_open(id):
+                self._shed[id] = (now, power, 0.0)
+        if self._shed:
+            _LOGGER.info("Holding circuits shed before restart: %s", list(self._shed))
+        if len(self._shed) != len(data["shed"]):
+            self._save()
+
+    def _data_to_save(self) -> dict:
+        return {"shed": {id: power for id, (_, power, _) in self._shed.items()}}
+
+    def _save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_sample(self, *_) -> None:
+        """Fetch mains power and shed or restore circuits as needed."""
+        if self._lock.locked():
+            # The previous sample is still waiting on the panel.
+            return
+        async with self._lock:
+            try:
+                await self.async_evaluate(await self.span_panel.async_grid_power())
+            except (httpx.HTTPError, DecodeError) as err:
+                _LOGGER.debug("Load shedding sample failed: %s", err)
+
+    async def async_evaluate(self, grid_power: float) -> None:
+        """Act on one grid power sample."""
+        now = time.monotonic()
+        if self._shed:
+            self._release_lost(now)
+        if self._settling is not None:
+            before, shed, deadline = self._settling
+            if grid_power > before - SETTLE_FRACTION * shed and now < deadline:
+                # The panel may not have sampled since the relays opened
+                return
+            self._settling = None
+        if grid_power > self.limit:
+            await self._async_shed(grid_power, now)
+        elif self._shed and grid_power < self.limit - self.hysteresis:
+            await self._async_restore(grid_power, now)
+
+    def _release_lost(self, now: float) -> None:
+        """Let go of shed circuits closed by hand, removed or made uncontrollable."""
+        circuits = self.span_panel.circuits
+        # Only circuit data fetched after the panel opened a relay shows it
+        fetched = circuits.circuits_results.extensions[TIMING].started
+        lost = [
+            id
+            for id, (_, _, accepted) in self._shed.items()
+            if id not in circuits.circuit_data
+            or not circuits.is_user_controllable(id)
+            or (accepted < fetched and circuits.is_relay_closed(id))
+        ]
+        if not lost:
+            return
+        _LOGGER.info("No longer holding circuits %s open", lost)
+        for id in lost:
+            self._forget(id, now)
+        self._save()
+
+    def _forget(self, id: str, now: float) -> None:
+        del self._shed[id]
+        self._restore_failures.pop(id, None)
+        self._last_closed[id] = now
+
+    def _candidates(self, now: float) -> list[tuple[int, float, str]]:
+        circuits = self.span_panel.circuits
+        candidates = []
+        for id in circuits.keys():
+            tier = SHED_TIERS.get(circuits.get_priority(id))
+            if tier is None or id in self._shed:
+                continue
+            if not circuits.is_user_controllable(id) or circuits.is_relay_open(id):
+                continue
+            if now - self._last_closed.get(id, -math.inf) < self.min_on_time:
+                continue
+            # Largest loads first within a tier so fewer circuits get opened
+            candidates.append((tier, -abs(circuits.power(id)), id))
+        candidates.sort()
+        return candidates
+
+    async def _async_shed(self, grid_power: float, now: float) -> None:
+        excess = grid_power - self.limit
+        batch = []
+        for _tier, neg_power, id in self._candidates(now):
+            if excess <= 0:
+                break
+            batch.append((id, -neg_power))
+            excess += neg_power
+
+        if not batch:
+            return
+
+        _LOGGER.info("Shedding circuits %s", [id for id, _ in batch])
+        circuits = self.span_panel.circuits
+        results = await asyncio.gather(
+            *(circuits.set_relay_open(id) for id, _ in batch), return_exceptions=True
+        )
+        accepted = time.time()
+        opened = shed = 0.0
+        for (id, power), result in zip(batch, results):
+            if isinstance(result, httpx.HTTPError):
+                _LOGGER.warning("Could not shed circuit %s: %s", id, result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                self._shed[id] = (now, power, accepted)
+                opened += 1
+                shed += power
+        if opened:
+            self._settling = (grid_power, shed, now + SETTLE_TIME)
+            self._save()
+            await self._async_changed()
+
+    async def _async_restore(self, grid_power: float, now: float) -> None:
+        # Restore one circuit per sample, last shed first, and only when
+        # its load fits below the hysteresis band. Circuits still within
+        # min_off_time or waiting to retry a failed restore are passed over.
+        for id, (opened, power, _) in reversed(self._shed.items()):
+            if now - opened < self.min_off_time:
+                continue
+            failures, retry_at = self._restore_failures.get(id, (0, now))
+            if now >= retry_at:
+                break
+        else:
+            return
+        if grid_power + power >= self.limit - self.hysteresis:
+            return
+
+        _LOGGER.info("Restoring circuit %s", id)
+        try:
+            await self.span_panel.circuits.set_relay_closed(id)
+        except httpx.HTTPError as err:
+            if isinstance(err, httpx.HTTPStatusError) and err.response.is_client_error:
+                # Retrying a request the panel refuses cannot succeed
+                _LOGGER.warning("Panel refused to restore circuit %s, letting it go: %s", id, err)
+                self._forget(id, now)
+                self._save()
+                return
+            failures += 1
+            backoff = min(RESTORE_BACKOFF * 2 ** (failures - 1), RESTORE_MAX_BACKOFF)
+            self._restore_failures[id] = (failures, now + backoff)
+            _LOGGER.warning(
+                "Could not restore circuit %s, retrying in %.0f s: %s", id, backoff, err
+            )
+            return
+        self._forget(id, now)
+        self._save()
+        await self._async_changed()
+
+    async def async_restore_all(self) -> None:
+        """Close every circuit the shedder opened."""
+        if not self._shed:
+            return
+        circuits = self.span_panel.circuits
+        ids = list(self._shed)
+        results = await asyncio.gather(
+            *(circuits.set_relay_closed(id) for id in ids), return_exceptions=True
+        )
+        for id, result in zip(ids, results):
+            if result is None:
+                del self._shed[id]
+            else:
+                _LOGGER.warning("Could not restore circuit %s: %s", id, result)
+        # Whatever failed is retried by the next setup
+        await self._store.async_save(self._data_to_save())
+
+    async def _async_changed(self) -> None:
+        if self._on_change is not None:
+            await self._on_change()
@@ -0,0 +1,50 @@
+"""One consistent, timestamped generation of panel data."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, NamedTuple
+
+
+class Timing(NamedTuple):
+    """Wall clock time a request was sent and its response received."""
+
+    started: float
+    finished: float
+
+    @property
+    def midpoint(self) -> float:
+        """Return the best estimate of when the panel took the sample."""
+        return (self.started + self.finished) / 2
+
+
+@dataclass(frozen=True)
+class PanelSnapshot:
+    """Status, mains and circuits from one coordinator tick.
+
+    A snapshot is never modified; each tick builds a new one and swaps it
+    in, so whoever holds one reads a single generation of data. Timestamps
+    are time.time() values.
+    """
+
+    status: Any
+    panel: Any
+    circuits: dict[str, Any]
+    status_timing: Timing
+    panel_timing: Timing
+    circuits_timing: Timing
+
+    @property
+    def sample_time(self) -> float:
+        """Return the estimated time of the mains and circuit samples."""
+        return (self.panel_timing.midpoint + self.circuits_timing.midpoint) / 2
+
+    @property
+    def skew(self) -> float:
+        """Return the window, in seconds, the mains and circuit samples fall in.
+
+        Values derived from both, like mains minus the sum of circuits,
+        may mix readings up to this far apart.
+        """
+        return max(self.panel_timing.finished, self.circuits_timing.finished) - min(
+            self.panel_timing.started, self.circuits_timing.started
+        )
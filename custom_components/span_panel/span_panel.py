@@ -5,11 +5,32 @@ import time
 
 import httpx
 
+try:
+    from .commands import PRIORITY, RELAY, CommandTracker
+    from .models import decode_circuits, decode_panel, decode_status
+    from .profiling import DECODE, NETWORK, QUEUE
+    from .scheduler import PRIORITY_COMMAND, PRIORITY_POLL, get_scheduler
+    from .snapshot import PanelSnapshot, Timing
+except ImportError:  # run directly as a script
+    from commands import PRIORITY, RELAY, CommandTracker
+    from models import decode_circuits, decode_panel, decode_status
+    from profiling import DECODE, NETWORK, QUEUE
+    from scheduler import PRIORITY_COMMAND, PRIORITY_POLL, get_scheduler
+    from snapshot import PanelSnapshot, Timing
+
 STATUS_URL = "http://{}/api/v1/status"
 SPACES_URL = "http://{}/api/v1/spaces"
 CIRCUITS_URL = "http://{}/api/v1/circuits"
 PANEL_URL = "http://{}/api/v1/panel"
 
+# Responses are reused for this long so bursts of refreshes from switches,
+# the coordinator and config flows collapse into one request.
+DEFAULT_CACHE_TTL = 0.5
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+# Key of the snapshot.Timing in a response's extensions
+TIMING = "span_panel_timing"
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -30,14 +51,31 @@ class SpanPanel:
         self,
         host,
         async_client=None,
+        cache_ttl=DEFAULT_CACHE_TTL,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
     ):
         """Init the SPAN."""
         self.host = host.lower()
         self.serial_number = None
         self.status_results = None
+        self.status_data = None
         self.circuits = SpanPanelCircuits(self)
         self.panel_results = None
+        self.panel_data = None
         self._async_client = async_client
+        self._scheduler = get_scheduler(self.host)
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.retries = retries
+        self.request_count = 0
+        self.retry_count = 0
+        self.error_count = 0
+        # Set to a profiling.Profiler to time requests and decoding
+        self.profiler = None
+        self.commands = CommandTracker()
+        # The last complete tick, see async_snapshot()
+        self.snapshot = None
 
     async def circuits_url(self):
         # The API changed in r202223 but appears to simply have renamed
@@ -45,53 +83,95 @@ class SpanPanel:
 
         # firmware_version() requires that getStatusData() has been
         # called at least once
-        if self.status_results is None:
+        if self.status_data is None:
             await self.getStatusData()
 
         if self.firmware_version() < "spanos2/r202223/04":
             return SPACES_URL
         return CIRCUITS_URL
 
+    @property
+    def scheduler(self):
+        """Return the request scheduler shared by all clients of the host."""
+        return self._scheduler
+
+    @property
+    def coalesced_count(self):
+        """Return how many GETs to the host were served by a shared request."""
+        return self._scheduler.coalesced_count
+
     @property
     def async_client(self):
         """Return the httpx client."""
         return self._async_client or httpx.AsyncClient(verify=False)
 
-    async def _async_fetch_with_retry(self, url, **kwargs):
-        """Retry 3 times to fetch the url if there is a transport error."""
-        for attempt in range(3):
+    async def _async_fetch_with_retry(self, url, priority=PRIORITY_POLL, **kwargs):
+        """Retry to fetch the url if there is a transport error."""
+        for attempt in range(self.retries):
             _LOGGER.debug(
                 "HTTP GET Attempt #%s: %s",
                 attempt + 1,
                 url,
             )
+            if (profiler := self.profiler) is not None:
+                queued = time.perf_counter()
             try:
-                async with self.async_client as client:
-                    resp = await client.get(url, timeout=30, **kwargs
-                    )
-                    _LOGGER.debug("Fetched from %s: %s: %s", url, resp, resp.text)
-                    return resp
+                async with self._scheduler.slot(priority):
+                    self.request_count += 1
+                    if profiler is not None:
+                        sent = time.perf_counter()
+                        profiler.record(QUEUE, sent - queued)
+                    started = time.time()
+                    async with self.async_client as client:
+                        resp = await client.get(url, timeout=self.timeout, **kwargs
+                        )
+                        # Travels with the response, also to clients sharing it
+                        resp.extensions[TIMING] = Timing(started, time.time())
+                        if profiler is not None:
+                            profiler.record(NETWORK, time.perf_counter() - sent)
+                        if _LOGGER.isEnabledFor(logging.DEBUG):
+                            # resp.text decodes the whole body; only pay for it when logged
+                            _LOGGER.debug("Fetched from %s: %s: %s", url, resp, resp.text)
+                        if resp.is_error:
+                            self.error_count += 1
+                        return resp
             except httpx.TransportError:
-                if attempt == 2:
+                if attempt == self.retries - 1:
+                    self.error_count += 1
                     raise
+                self.retry_count += 1
 
     async def _async_post(self, url, json=None, **kwargs):
         _LOGGER.debug("HTTP POST Attempt: %s", url)
         try:
-            async with self.async_client as client:
-                resp = await client.post(url, json=json, timeout=30, **kwargs)
-                _LOGGER.debug("HTTP POST %s: %s: %s", url, resp, resp.text)
-                return resp
-        except httpx.TransportError:  # pylint: disable=try-except-raise
+            async with self._scheduler.slot(PRIORITY_COMMAND):
+                self.request_count += 1
+                async with self.async_client as client:
+                    resp = await client.post(url, json=json, timeout=self.timeout, **kwargs)
+                    # Anything fetched before the command may now be stale
+                    self._scheduler.invalidate()
+                    if _LOGGER.isEnabledFor(logging.DEBUG):
+                        _LOGGER.debug("HTTP POST %s: %s: %s", url, resp, resp.text)
+                    if resp.is_error:
+                        self.error_count += 1
+                    return resp
+        except httpx.TransportError:
+            self.error_count += 1
             raise
 
-    async def getData(self, url):
+    async def getData(self, url, priority=PRIORITY_POLL):
         """Fetch data from the endpoint and if inverters selected default"""
         """to fetching inverter data."""
         """Update from PC endpoint."""
         formatted_url = url.format(self.host)
-        response = await self._async_fetch_with_retry(
-            formatted_url, follow_redirects=False
+        # Concurrent GETs of the same URL from any client of this host
+        # share a single request, and its response for cache_ttl seconds.
+        response = await self._scheduler.shared(
+            formatted_url,
+            lambda: self._async_fetch_with_retry(
+                formatted_url, priority, follow_redirects=False
+            ),
+            ttl=self.cache_ttl,
         )
         return response
 
@@ -103,21 +183,69 @@ class SpanPanel:
         response = await self._async_post(formatted_url, json)
         return response
 
+    def _decode(self, decode, response):
+        # Decode with the layout of the firmware the panel last reported
+        firmware = self.status_data.software.firmware_version if self.status_data else None
+        if self.profiler is None:
+            return decode(response.content, firmware)
+        with self.profiler.phase(DECODE):
+            return decode(response.content, firmware)
+
+    async def async_snapshot(self):
+        """Fetch every endpoint concurrently and swap in the results at once.
+
+        Returns the new PanelSnapshot, also kept in self.snapshot.
+        """
+        circuits_url = await self.circuits_url()
+        status, panel, circuits = await asyncio.gather(
+            self.getData(STATUS_URL), self.getData(PANEL_URL), self.getData(circuits_url)
+        )
+        for response in (status, panel, circuits):
+            response.raise_for_status()
+        status_data = self._decode(decode_status, status)
+        panel_data = self._decode(decode_panel, panel)
+        circuit_data = self._decode(decode_circuits, circuits)
+
+        # No awaits from here on, so nothing sees half of this tick's data
+        self.status_results, self.status_data = status, status_data
+        self.panel_results, self.panel_data = panel, panel_data
+        self.circuits.circuits_results, self.circuits.circuit_data = circuits, circuit_data
+        if self.serial_number is None:
+            self.serial_number = status_data.system.serial
+        self.commands.confirm(circuit_data)
+        self.snapshot = PanelSnapshot(
+            status=status_data,
+            panel=panel_data,
+            circuits=circuit_data,
+            status_timing=status.extensions[TIMING],
+            panel_timing=panel.extensions[TIMING],
+            circuits_timing=circuits.extensions[TIMING],
+        )
+        return self.snapshot
+
+    async def async_grid_power(self, priority=PRIORITY_POLL):
+        """Fetch and return mains power without replacing the tick's data."""
+        response = await self.getData(PANEL_URL, priority)
+        response.raise_for_status()
+        return self._decode(decode_panel, response).instant_grid_power_w
+
     async def getPanelData(self):
         self.panel_results = await self.getData(PANEL_URL)
+        self.panel_results.raise_for_status()
+        self.panel_data = self._decode(decode_panel, self.panel_results)
 
         return
-    
+
     def power(self):
-        raw_json = self.panel_results.json()
-        return self.json_data[PANEL_POWER]
+        return self.panel_data.instant_grid_power_w
 
-    async def getStatusData(self):
-        self.status_results = await self.getData(STATUS_URL)
+    async def getStatusData(self, priority=PRIORITY_POLL):
+        self.status_results = await self.getData(STATUS_URL, priority)
+        self.status_results.raise_for_status()
+        self.status_data = self._decode(decode_status, self.status_results)
 
         if self.serial_number == None:
-           raw_json = self.status_results.json()
-           self.serial_number = raw_json[SPAN_SYSTEM]["serial"]
+           self.serial_number = self.status_data.system.serial
 
         return
 
@@ -125,41 +253,29 @@ class SpanPanel:
         """Running getData() beforehand will set self.enpoint_type and"""
         """self.isDataRetrieved"""
         """so that this method will only read data from stored variables"""
-        raw_json = self.status_results.json()
-        doorState = raw_json[SPAN_SYSTEM][SYSTEM_DOOR_STATE]
-        if doorState == SYSTEM_DOOR_STATE_CLOSED:
-           return True
-        else:
-           return False
+        return self.status_data.system.door_state == SYSTEM_DOOR_STATE_CLOSED
 
     def is_door_open(self):
         return not self.is_door_closed()
 
     def is_ethernet_connected(self):
-        raw_json = self.status_results.json()
-        return raw_json['network'][SYSTEM_ETHERNET_LINK]
+        return self.status_data.network.eth0_link
 
     def is_wifi_connected(self):
-        raw_json = self.status_results.json()
-        return raw_json['network'][SYSTEM_WIFI_LINK]
+        return self.status_data.network.wlan_link
 
     def is_cellular_connected(self):
-        raw_json = self.status_results.json()
-        return raw_json['network'][SYSTEM_CELLULAR_LINK]
+        return self.status_data.network.wwan_link
 
     def firmware_version(self):
         """Running getData() beforehand will set self.enpoint_type and self.isDataRetrieved"""
         """so that this method will only read data from stored variables"""
-
-        raw_json = self.status_results.json()
-        return raw_json["software"]["firmwareVersion"]
+        return self.status_data.software.firmware_version
 
     def model(self):
         """Running getData() beforehand will set self.enpoint_type and self.isDataRetrieved"""
         """so that this method will only read data from stored variables"""
-
-        raw_json = self.status_results.json()
-        return raw_json["system"]["model"]
+        return self.status_data.system.model
 
     def run_in_console(self):
         """If running this module directly, print all the values in the console."""
@@ -224,6 +340,7 @@ CIRCUITS_ENERGY_PRODUCED = "producedEnergyWh"
 CIRCUITS_ENERGY_CONSUMED = "consumedEnergyWh"
 CIRCUITS_BREAKER_POSITIONS = "tabs"
 CIRCUITS_PRIORITY = "priority"
+CIRCUITS_PRIORITIES = ("MUST_HAVE", "NICE_TO_HAVE", "NOT_ESSENTIAL", "NON_ESSENTIAL")
 CIRCUITS_IS_USER_CONTROLLABLE = "is_user_controllable"
 CIRCUITS_IS_SHEDDABLE = "is_sheddable"
 CIRCUITS_IS_NEVER_BACKUP = "is_never_backup"
@@ -236,7 +353,8 @@ class SpanPanelCircuits:
     ):
         """Init the SPAN."""
         self.panel = panel
-        self.json_data = None
+        self.circuits_results = None
+        self.circuit_data = None
 
     async def getData(self):
         """Fetch data from the endpoint and if inverters selected default"""
@@ -249,63 +367,72 @@ class SpanPanelCircuits:
         # HTTPStatusError - httpx.HTTPStatusError: Server error '500 Internal Server Error' for url 'http://span.lan/api/v1/circuits'
         results.raise_for_status()
 
-        self.json_data = results.json()[SPAN_CIRCUITS]
+        self.circuits_results = results
+        self.circuit_data = self.panel._decode(decode_circuits, results)
+        self.panel.commands.confirm(self.circuit_data)
 
         return
 
     def keys(self):
-        return self.json_data.keys()
+        return self.circuit_data.keys()
 
     def name(self, id):
-        return self.json_data[id][CIRCUITS_NAME]
+        return self.circuit_data[id].name
 
     def power(self, id):
-        return self.json_data[id][CIRCUITS_POWER]
+        return self.circuit_data[id].instant_power_w
 
     def energy_produced(self, id):
-        return self.json_data[id][CIRCUITS_ENERGY_PRODUCED]
+        return self.circuit_data[id].produced_energy_wh
 
     def energy_consumed(self, id):
-        return self.json_data[id][CIRCUITS_ENERGY_CONSUMED]
+        return self.circuit_data[id].consumed_energy_wh
 
     def is_relay_open(self, id):
-        relayState = self.json_data[id][CIRCUITS_RELAY]
-        if relayState == CIRCUITS_RELAY_CLOSED:
-           return False
-        else:
-           return True
+        return self.circuit_data[id].relay_state != CIRCUITS_RELAY_CLOSED
 
     def is_relay_closed(self, id):
         return not self.is_relay_open(id)
 
+    async def _async_command(self, id, kind, target, json):
+        """Post a command, record it and raise if the panel rejects it."""
+        commands = self.panel.commands
+        command = commands.sent(id, kind, target)
+        try:
+            results = await self.panel.setJSONData(await self.panel.circuits_url()+"/{}", id, json)
+        except httpx.HTTPError as err:
+            commands.result(command, None, str(err))
+            raise
+        commands.result(command, results.status_code)
+        # We get '<Response [400 Bad Request]>' if 'id' has
+        # 'is_user_controllable' set to False
+        results.raise_for_status()
+        return results
+
     async def _set_relay(self, id, state):
         # state should be "OPEN" or "CLOSED"
         json = {"relay_state_in":{"relayState":state}}
-        results = await self.panel.setJSONData(await self.panel.circuits_url()+"/{}", id, json)
+        return await self._async_command(id, RELAY, state, json)
 
     async def set_relay_closed(self, id):
-        await self._set_relay(id, CIRCUITS_RELAY_CLOSED)
+        return await self._set_relay(id, CIRCUITS_RELAY_CLOSED)
 
     async def set_relay_open(self, id):
-        await self._set_relay(id, CIRCUITS_RELAY_OPEN)
+        return await self._set_relay(id, CIRCUITS_RELAY_OPEN)
 
     def breaker_positions(self, id):
-        return self.json_data[id][CIRCUITS_BREAKER_POSITIONS]
+        return self.circuit_data[id].tabs
 
     def get_priority(self, id):
         # should be 'NOT_ESSENTIAL', 'MUST_HAVE', or 'NICE_TO_HAVE'
-        return self.json_data[id][CIRCUITS_PRIORITY]
+        return self.circuit_data[id].priority
 
     async def set_priority(self, id, priority):
         json = {"priority_in":{"priority":priority}}
-        results = await self.panel.setJSONData(await self.panel.circuits_url()+"/{}", id, json)
-
-        # add error checking code on response, we can get:
-        # '<Response [400 Bad Request]>' if 'id' has 'is_user_controllable'
-        # set to False
+        return await self._async_command(id, PRIORITY, priority, json)
 
     def is_user_controllable(self, id):
-        return self.json_data[id][CIRCUITS_IS_USER_CONTROLLABLE]
+        return self.circuit_data[id].is_user_controllable
 
 
 
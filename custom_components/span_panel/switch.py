@@ -1,70 +1,59 @@
 """Control switches."""
-from datetime import timedelta
 import logging
 
-from .span_panel import SpanPanel, CIRCUITS_POWER, CIRCUITS_ENERGY_PRODUCED, CIRCUITS_ENERGY_CONSUMED
-import async_timeout
+import httpx
+
+from .span_panel import SpanPanel
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-)
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from .const import COORDINATOR, DOMAIN
-from .util import panel_to_device_info
+from .entity import SpanPanelCircuitEntity
+from .topology import async_add_circuit_entities
 
 ICON = "mdi:toggle-switch"
 
 _LOGGER = logging.getLogger(__name__)
 
-class SpanPanelCircuitsSwitch(CoordinatorEntity, SwitchEntity):
+class SpanPanelCircuitsSwitch(SpanPanelCircuitEntity, SwitchEntity):
     """Represent a switch entity."""
 
+    _attr_icon = ICON
+
     def __init__(
         self,
         coordinator: DataUpdateCoordinator,
         id: str,
-        name: str,
     ) -> None:
         """Initialize the values."""
-        _LOGGER.debug("CREATE SWITCH %s" % name)
-        span_panel: SpanPanel = coordinator.data
-
-        self.id = id
-        self._attr_unique_id = f"span_{span_panel.serial_number}_relay_{id}"
-        self._attr_device_info = panel_to_device_info(span_panel)
-        super().__init__(coordinator)
+        super().__init__(coordinator, id, f"relay_{id}", "Breaker")
+        _LOGGER.debug("CREATE SWITCH %s", self._attr_name)
 
     async def async_turn_on(self, **kwargs):
         """Turn the switch on."""
         _LOGGER.debug("TURN SWITCH ON")
         span_panel: SpanPanel = self.coordinator.data
-        await span_panel.circuits.set_relay_closed(self.id)
+        try:
+            await span_panel.circuits.set_relay_closed(self.id)
+        except httpx.HTTPError as err:
+            raise HomeAssistantError(f"Could not switch {self.name}: {err}") from err
         await self.coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs):
         """Turn the switch off."""
         _LOGGER.debug("TURN SWITCH OFF")
         span_panel: SpanPanel = self.coordinator.data
-        await span_panel.circuits.set_relay_open(self.id)
+        try:
+            await span_panel.circuits.set_relay_open(self.id)
+        except httpx.HTTPError as err:
+            raise HomeAssistantError(f"Could not switch {self.name}: {err}") from err
         await self.coordinator.async_request_refresh()
 
-    @property
-    def icon(self):
-        """Icon to use in the frontend."""
-        return ICON
-
-    @property
-    def name(self):
-        """Return the switch name."""
-        span_panel: SpanPanel = self.coordinator.data
-        return f"{span_panel.circuits.name(self.id)} Breaker"
-
     @property
     def is_on(self) -> bool:
         """Get switch state."""
@@ -85,16 +74,14 @@ async def async_setup_entry(
     data: dict = hass.data[DOMAIN][config_entry.entry_id]
 
     coordinator: DataUpdateCoordinator = data[COORDINATOR]
-    span_panel: SpanPanel = coordinator.data
-    serial_number: str = config_entry.unique_id
-
-    entities: list[SpanPanelCircuitsSwitch] = []
 
-    for id in span_panel.circuits.keys():
-       if span_panel.circuits.is_user_controllable(id):
-          name = span_panel.circuits.name(id)
-          entities.append(
-             SpanPanelCircuitsSwitch(coordinator, id, name)
-          )
+    def create_entities(circuits):
+        return [
+            SpanPanelCircuitsSwitch(coordinator, circuit.id)
+            for circuit in circuits
+            if circuit.user_controllable
+        ]
 
-    async_add_entities(entities)
+    async_add_circuit_entities(
+        hass, config_entry, async_add_entities, create_entities
+    )
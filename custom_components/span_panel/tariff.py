@@ -0,0 +1,51 @@
+"""Time-of-use tariff schedules.
+
+A schedule is written as comma separated rates per kWh, each optionally
+prefixed with the time of day (HH:MM) it starts at; a bare rate starts
+at 00:00:
+
+    0.12, 16:00=0.35, 21:00=0.12
+
+The last rate of the day carries on past midnight until the first one.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import datetime
+import math
+import re
+
+_TIME = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+class Tariff:
+    """Rates per kWh by time of day."""
+
+    def __init__(self, schedule: str):
+        """Parse schedule; raise ValueError if it is not valid."""
+        starts: dict[int, float] = {}
+        for part in schedule.split(","):
+            start, _, rate = part.strip().rpartition("=")
+            minute = 0
+            if start:
+                if (match := _TIME.fullmatch(start.strip())) is None:
+                    raise ValueError(f"{start} is not a time of day (HH:MM)")
+                hours, minutes = int(match[1]), int(match[2])
+                if hours > 23 or minutes > 59:
+                    raise ValueError(f"{start} is not a time of day")
+                minute = hours * 60 + minutes
+            if minute in starts:
+                raise ValueError(f"two rates start at {start or '00:00'}")
+            if not math.isfinite(value := float(rate)):
+                raise ValueError(f"{rate.strip()} is not a rate")
+            starts[minute] = value
+        if not starts:
+            raise ValueError("no rates")
+        self._starts = sorted(starts)
+        self._rates = [starts[minute] for minute in self._starts]
+
+    def rate_at(self, when: datetime) -> float:
+        """Return the rate in effect at a local time."""
+        index = bisect_right(self._starts, when.hour * 60 + when.minute) - 1
+        # Before the first start of the day the last rate of the day applies
+        return self._rates[index]
@@ -0,0 +1,167 @@
+"""Follow circuits being added, removed or re-tabbed without a reload.
+
+The circuit table built here is computed once per topology change and
+shared by every platform, so setup walks the panel's circuits only once.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+import logging
+from typing import NamedTuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .const import DOMAIN, TOPOLOGY
+from .entity import SpanPanelCircuitEntity
+from .span_panel import SpanPanel
+
+SIGNAL_TOPOLOGY = DOMAIN + "_topology_{}"
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TopologyChange:
+    """Circuit ids that appeared, disappeared, changed shape or changed otherwise.
+
+    A circuit has changed shape when the entities it should have differ;
+    those are recreated. Other changes, like moved tabs, are updated in
+    place.
+    """
+
+    added: frozenset[str]
+    removed: frozenset[str]
+    changed: frozenset[str]
+    updated: frozenset[str] = frozenset()
+
+
+class CircuitDescriptor(NamedTuple):
+    """The parts of a circuit its entities are built from."""
+
+    id: str
+    tabs: tuple[int, ...]
+    user_controllable: bool
+
+    @property
+    def shape(self) -> tuple:
+        """Return what decides which entities the circuit has."""
+        # Switches and priority selects exist only for controllable circuits
+        return (self.user_controllable,)
+
+
+def circuit_topology(span_panel: SpanPanel) -> dict[str, CircuitDescriptor]:
+    """Return the descriptor of every circuit."""
+    return {
+        id: CircuitDescriptor(id, tuple(circuit.tabs), circuit.is_user_controllable)
+        for id, circuit in span_panel.circuits.circuit_data.items()
+    }
+
+
+def diff_topology(
+    old: dict[str, CircuitDescriptor], new: dict[str, CircuitDescriptor]
+) -> TopologyChange | None:
+    """Compare two topology snapshots."""
+    if old == new:
+        return None
+    differing = [id for id in old.keys() & new.keys() if old[id] != new[id]]
+    return TopologyChange(
+        added=frozenset(new.keys() - old.keys()),
+        removed=frozenset(old.keys() - new.keys()),
+        changed=frozenset(id for id in differing if old[id].shape != new[id].shape),
+        updated=frozenset(id for id in differing if old[id].shape == new[id].shape),
+    )
+
+
+@callback
+def async_track_topology(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    coordinator: DataUpdateCoordinator,
+    topology: dict[str, CircuitDescriptor],
+) -> CALLBACK_TYPE:
+    """Keep topology current and send SIGNAL_TOPOLOGY when a refresh changes it.
+
+    topology is updated in place, so whoever holds it sees the change.
+    """
+
+    @callback
+    def _async_check() -> None:
+        if not coordinator.last_update_success:
+            return
+        new_topology = circuit_topology(coordinator.data)
+        if (change := diff_topology(topology, new_topology)) is None:
+            return
+        topology.clear()
+        topology.update(new_topology)
+        _LOGGER.info("Circuit topology changed: %s", change)
+        async_dispatcher_send(hass, SIGNAL_TOPOLOGY.format(entry.entry_id), change)
+
+    return coordinator.async_add_listener(_async_check)
+
+
+@callback
+def async_add_circuit_entities(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    create_entities: Callable[
+        [Iterable[CircuitDescriptor]], list[SpanPanelCircuitEntity]
+    ],
+    other_entities: Iterable[Entity] = (),
+) -> None:
+    """Add a platform's circuit entities and keep them in step with the panel.
+
+    create_entities builds the entities for a set of circuit descriptors.
+    It is called for every circuit at setup and afterwards only for
+    circuits that were added or changed shape. Entities that are not
+    created again, because their circuit was removed or no longer has
+    them, are removed from the entity registry. Entities of circuits that
+    changed otherwise are kept and only write their state again.
+    """
+    topology: dict[str, CircuitDescriptor] = hass.data[DOMAIN][entry.entry_id][TOPOLOGY]
+    tracked: dict[str, list[SpanPanelCircuitEntity]] = {}
+
+    def _create(ids: Iterable[str]) -> list[SpanPanelCircuitEntity]:
+        entities = create_entities([topology[id] for id in ids])
+        for entity in entities:
+            tracked.setdefault(entity.id, []).append(entity)
+        return entities
+
+    async_add_entities([*other_entities, *_create(topology)])
+
+    async def _async_topology_changed(change: TopologyChange) -> None:
+        registry = er.async_get(hass)
+        old_entities = [
+            entity for id in change.removed | change.changed for entity in tracked.pop(id, [])
+        ]
+        new_entities = _create(change.added | change.changed)
+        recreated = {entity.unique_id for entity in new_entities}
+        for entity in old_entities:
+            if entity.unique_id not in recreated and entity.registry_entry is not None:
+                # Gone for good, e.g. a switch of a circuit that is no
+                # longer user controllable; don't leave it unavailable
+                registry.async_remove(entity.entity_id)
+            else:
+                await entity.async_remove()
+        if new_entities:
+            async_add_entities(new_entities)
+        for id in change.updated:
+            for entity in tracked.get(id, []):
+                if entity.hass is not None:
+                    entity.async_write_ha_state()
+
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_TOPOLOGY.format(entry.entry_id), _async_topology_changed
+        )
+    )
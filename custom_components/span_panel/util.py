@@ -3,8 +3,13 @@ from .const import DOMAIN
 
 from .span_panel import SpanPanel
 
+# (serial, host, model, firmware) -> DeviceInfo shared by all entities
+_DEVICE_INFO: dict[tuple, DeviceInfo] = {}
+
 def panel_to_device_info(panel: SpanPanel):
-   return DeviceInfo(
+   key = (panel.serial_number, panel.host, panel.model(), panel.firmware_version())
+   if (device_info := _DEVICE_INFO.get(key)) is None:
+      device_info = _DEVICE_INFO[key] = DeviceInfo(
             identifiers={(DOMAIN, panel.serial_number)},
             manufacturer="Span",
             model=f"Span Panel ({panel.model()})",
@@ -12,3 +17,4 @@ def panel_to_device_info(panel: SpanPanel):
             sw_version=panel.firmware_version(),
             configuration_url=f"http://{panel.host}",
         )
+   return device_info
@@ -0,0 +1,306 @@
+"""Load test one Home Assistant instance with many Span Panels.
+
+Run from the repository root with Home Assistant and aiohttp installed:
+
+    python scripts/bench_scale.py --panels 1 4 16 32 --circuits 32 --duration 60
+
+For each panel count, fake_panel.py serves that many simulated panels in
+its own process, and a fresh Home Assistant is booted in a temporary
+config directory with the recorder on SQLite. One config entry per panel
+is added through the config flow, every coordinator is switched to
+--interval, and after a warm up tick the following is sampled for
+--duration seconds:
+
+- event loop lag: how late a short sleep on the loop wakes up
+- tick latency: time each coordinator's update takes
+- CPU: process time over wall time, including the recorder thread
+- memory: resident set size at the end
+- recorder writes: state changes per second and rows added to states
+
+Each panel count runs in a child process so no state or memory carries
+over from the previous one.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import timedelta
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FAKE_PANEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_panel.py")
+
+# Keys of const.py, not imported so Home Assistant loads the integration itself
+DOMAIN = "span_panel"
+COORDINATOR = "coordinator"
+LAG_PERIOD = 0.05
+
+CONFIGURATION = """\
+homeassistant:
+  name: Span Scale
+  latitude: 0
+  longitude: 0
+  elevation: 0
+  unit_system: metric
+  time_zone: UTC
+recorder:
+  db_url: sqlite:///{db}
+  commit_interval: 1
+"""
+
+
+def percentile(values: list[float], percentile: float) -> float:
+    """Return a percentile of values, nearest rank."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def rss() -> int:
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def count_states(db: str) -> int:
+    """Return the number of rows the recorder has committed to states."""
+    with sqlite3.connect(f"file:{db}?mode=ro", uri=True) as connection:
+        return connection.execute("SELECT COUNT(*) FROM states").fetchone()[0]
+
+
+async def start_fake_panels(panels: int, circuits: int, port: int, latency: float):
+    """Start fake_panel.py and wait until it serves."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        FAKE_PANEL,
+        "--panels",
+        str(panels),
+        "--circuits",
+        str(circuits),
+        "--port",
+        str(port),
+        "--latency",
+        str(latency),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    if not await process.stdout.readline():
+        raise SystemExit("fake_panel.py did not start")
+    return process
+
+
+async def start_hass(config_dir: str):
+    """Boot Home Assistant from config_dir the way the hass command does."""
+    from homeassistant import bootstrap, runner
+
+    hass = await bootstrap.async_setup_hass(
+        runner.RuntimeConfig(config_dir=config_dir, skip_pip=True)
+    )
+    if hass is None:
+        raise SystemExit("Home Assistant failed to start")
+    await hass.async_start()
+    return hass
+
+
+async def add_panels(hass, hosts: list[str]) -> list:
+    """Add a config entry per host through the config flow and return the coordinators."""
+    from homeassistant import config_entries
+    from homeassistant.const import CONF_HOST
+
+    coordinators = []
+    for host in hosts:
+        result = await hass.config_entries.flow.async_init(
+            DOMAIN, context={"source": config_entries.SOURCE_USER}, data={CONF_HOST: host}
+        )
+        if "result" not in result:
+            raise SystemExit(f"Could not add {host}: {result.get('errors') or result}")
+        entry_id = result["result"].entry_id
+        coordinators.append(hass.data[DOMAIN][entry_id][COORDINATOR])
+    await hass.async_block_till_done()
+    return coordinators
+
+
+async def measure(args: argparse.Namespace, panels: int) -> dict:
+    """Run panels fake panels against a fresh Home Assistant and return the results."""
+    from homeassistant.const import EVENT_STATE_CHANGED
+
+    baseline_rss = rss()
+    fake_panels = await start_fake_panels(panels, args.circuits, args.port, args.latency)
+    with tempfile.TemporaryDirectory(prefix="span_scale_") as config_dir:
+        db = os.path.join(config_dir, "home-assistant_v2.db")
+        with open(os.path.join(config_dir, "configuration.yaml"), "w") as configuration:
+            configuration.write(CONFIGURATION.format(db=db))
+        os.symlink(
+            os.path.join(os.path.abspath(ROOT), "custom_components"),
+            os.path.join(config_dir, "custom_components"),
+        )
+
+        hass = await start_hass(config_dir)
+        try:
+            coordinators = await add_panels(
+                hass, [f"127.0.0.1:{args.port + index}" for index in range(panels)]
+            )
+
+            ticks: list[float] = []
+
+            def timed(update_method):
+                async def update():
+                    start = time.perf_counter()
+                    try:
+                        return await update_method()
+                    finally:
+                        ticks.append(time.perf_counter() - start)
+
+                return update
+
+            for coordinator in coordinators:
+                coordinator.update_method = timed(coordinator.update_method)
+                coordinator.update_interval = timedelta(seconds=args.interval)
+            # One tick to schedule the new interval and warm up
+            await asyncio.gather(*(c.async_refresh() for c in coordinators))
+            await hass.async_block_till_done()
+
+            state_changes = 0
+
+            def count_state_change(event) -> None:
+                nonlocal state_changes
+                state_changes += 1
+
+            lags: list[float] = []
+
+            async def sample_lag() -> None:
+                loop = asyncio.get_running_loop()
+                while True:
+                    start = loop.time()
+                    await asyncio.sleep(LAG_PERIOD)
+                    lags.append(loop.time() - start - LAG_PERIOD)
+
+            await asyncio.sleep(2)
+            rows = await hass.async_add_executor_job(count_states, db)
+            ticks.clear()
+            remove_listener = hass.bus.async_listen(EVENT_STATE_CHANGED, count_state_change)
+            lag_task = asyncio.create_task(sample_lag())
+            wall, cpu = time.perf_counter(), time.process_time()
+
+            await asyncio.sleep(args.duration)
+
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            lag_task.cancel()
+            remove_listener()
+            # Give the recorder a commit interval to catch up, as at the start
+            await asyncio.sleep(2)
+            rows = await hass.async_add_executor_job(count_states, db) - rows
+            memory = rss()
+            entities = len(hass.states.async_entity_ids())
+        finally:
+            await hass.async_stop()
+            fake_panels.terminate()
+            await fake_panels.wait()
+
+    return {
+        "panels": panels,
+        "entities": entities,
+        "ticks": len(ticks),
+        "tick_p50": percentile(ticks, 50),
+        "tick_p95": percentile(ticks, 95),
+        "tick_max": max(ticks, default=float("nan")),
+        "lag_p50": percentile(lags, 50),
+        "lag_p99": percentile(lags, 99),
+        "lag_max": max(lags, default=float("nan")),
+        "cpu": cpu / wall,
+        "rss": memory,
+        "rss_growth": memory - baseline_rss,
+        "state_changes": state_changes / wall,
+        "rows": rows / wall,
+    }
+
+
+def run_child(args: argparse.Namespace, panels: int) -> dict:
+    """Measure one panel count in a fresh interpreter."""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--measure",
+        str(panels),
+        "--circuits",
+        str(args.circuits),
+        "--duration",
+        str(args.duration),
+        "--interval",
+        str(args.interval),
+        "--port",
+        str(args.port),
+        "--latency",
+        str(args.latency),
+    ]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Measuring {panels} panels failed")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def print_results(results: list[dict]) -> None:
+    """Print one row per panel count."""
+    print(
+        f"{'panels':>6} {'entities':>8} {'ticks':>6}"
+        f" {'tick p50':>9} {'p95':>8} {'max':>8}"
+        f" {'lag p50':>8} {'p99':>8} {'max':>8}"
+        f" {'cpu':>6} {'rss MiB':>8} {'+MiB':>6} {'states/s':>9} {'rows/s':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['panels']:>6} {r['entities']:>8} {r['ticks']:>6}"
+            f" {r['tick_p50'] * 1000:>7.1f}ms {r['tick_p95'] * 1000:>6.1f}ms"
+            f" {r['tick_max'] * 1000:>6.1f}ms"
+            f" {r['lag_p50'] * 1000:>6.1f}ms {r['lag_p99'] * 1000:>6.1f}ms"
+            f" {r['lag_max'] * 1000:>6.1f}ms"
+            f" {r['cpu']:>6.1%} {r['rss'] / 2**20:>8.0f} {r['rss_growth'] / 2**20:>6.0f}"
+            f" {r['state_changes']:>9.1f} {r['rows']:>7.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--panels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--circuits", type=int, default=32)
+    parser.add_argument(
+        "--duration", type=float, default=60, help="seconds to measure each panel count"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=15, help="coordinator update interval in seconds"
+    )
+    parser.add_argument("--port", type=int, default=18080, help="port of the first panel")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds each fake panel response takes"
+    )
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        print(json.dumps(asyncio.run(measure(args, args.measure))))
+        return
+
+    results = []
+    for panels in args.panels:
+        print(f"Measuring {panels} panels...", file=sys.stderr, flush=True)
+        results.append(run_child(args, panels))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
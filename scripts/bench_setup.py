@@ -0,0 +1,160 @@
+"""Benchmark importing the integration, entity setup and state reads.
+
+Run from the repository root with Home Assistant installed:
+
+    python scripts/bench_setup.py --circuits 48 --rounds 20 --panels 4
+
+Import time is measured in a fresh interpreter with -X importtime, so it
+reflects a cold start; setup time covers every platform of every panel.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import simulator  # noqa: E402
+
+from custom_components.span_panel import (  # noqa: E402
+    binary_sensor,
+    select,
+    sensor,
+    switch,
+)
+from custom_components.span_panel.anomaly import SpanPanelAnomalyDetector  # noqa: E402
+from custom_components.span_panel.const import (  # noqa: E402
+    ANOMALIES,
+    COORDINATOR,
+    COSTS,
+    DOMAIN,
+    PROFILES,
+    TOPOLOGY,
+)
+from custom_components.span_panel.models import (  # noqa: E402
+    BACKEND,
+    decode_circuits,
+    decode_panel,
+    decode_status,
+)
+from custom_components.span_panel.span_panel import SpanPanel  # noqa: E402
+from custom_components.span_panel.topology import circuit_topology  # noqa: E402
+
+PACKAGE = "custom_components.span_panel"
+PLATFORMS = (binary_sensor, select, sensor, switch)
+
+
+def measure_imports() -> list[tuple[str, int]]:
+    """Return the cold cumulative import time of the integration's modules in µs."""
+    modules = [PACKAGE] + [platform.__name__ for platform in PLATFORMS]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, _, fields = line.partition("import time:")
+        parts = [part.strip() for part in fields.split("|")]
+        if len(parts) == 3 and parts[2] in modules:
+            times.append((parts[2], int(parts[1])))
+    return times
+
+
+def make_panel(circuits: int, serial: str = "nj-bench") -> SpanPanel:
+    """Return a SpanPanel holding synthetic data."""
+    span_panel = SpanPanel(f"{serial}.invalid")
+    circuits_payload = simulator.circuits_payload(circuits)
+    span_panel.status_data = decode_status(
+        simulator.encode(simulator.status_payload(serial))
+    )
+    span_panel.serial_number = span_panel.status_data.system.serial
+    span_panel.panel_data = decode_panel(
+        simulator.encode(simulator.panel_payload(circuits_payload))
+    )
+    span_panel.circuits.circuit_data = decode_circuits(simulator.encode(circuits_payload))
+    return span_panel
+
+
+async def setup_entities(span_panels: list[SpanPanel]) -> list:
+    """Run every platform's async_setup_entry for each panel and return the entities."""
+    hass = SimpleNamespace(data={DOMAIN: {}}, config=SimpleNamespace(currency="USD"))
+    entities: list = []
+    for span_panel in span_panels:
+        entry = SimpleNamespace(
+            entry_id=span_panel.serial_number,
+            unique_id=span_panel.serial_number,
+            options={},
+            async_on_unload=lambda func: None,
+        )
+        profiles = SimpleNamespace(
+            hour=0,
+            baseline=lambda key, index, min_samples: None,
+            expected=lambda key: None,
+            forecast=lambda: [],
+        )
+        hass.data[DOMAIN][entry.entry_id] = {
+            COORDINATOR: SimpleNamespace(data=span_panel),
+            ANOMALIES: SpanPanelAnomalyDetector(15, profiles),
+            COSTS: None,
+            PROFILES: profiles,
+            TOPOLOGY: circuit_topology(span_panel),
+        }
+        for platform in PLATFORMS:
+            await platform.async_setup_entry(hass, entry, entities.extend)
+    return entities
+
+
+def read_states(entities: list) -> None:
+    """Read the state property of every entity once."""
+    for entity in entities:
+        getattr(entity, "native_value", None)
+        getattr(entity, "is_on", None)
+        getattr(entity, "current_option", None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--circuits", type=int, default=48)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--panels", type=int, default=1)
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    span_panels = [make_panel(args.circuits, f"nj-bench-{i}") for i in range(args.panels)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        entities = asyncio.run(setup_entities(span_panels))
+    setup = (time.perf_counter() - start) / args.rounds
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        read_states(entities)
+    reads = (time.perf_counter() - start) / args.rounds
+
+    print(f"decode backend:  {BACKEND}")
+    for module, micros in imports:
+        print(f"import {module.rpartition('.')[2]:<14}{micros / 1000:>8.2f} ms")
+    print(f"panels:          {args.panels}")
+    print(f"entities:        {len(entities)}")
+    print(f"setup:           {setup * 1000:.2f} ms ({setup * 1000 / args.panels:.2f} ms per panel)")
+    print(f"peak memory:     {peak / 1024:.0f} KiB")
+    print(f"state reads:     {reads * 1000:.2f} ms per tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Serve simulated Span Panels over HTTP for load tests.
+
+Each panel listens on its own port, starting at --port, and answers the
+panel's read API and relay and priority commands. Power drifts and energy
+meters advance as time passes, so every poll sees fresh data:
+
+    python scripts/fake_panel.py --panels 8 --circuits 32 --port 18080
+
+Only aiohttp is needed, not Home Assistant.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import time
+
+from aiohttp import web
+
+import simulator
+
+# Payloads change at most this often, in seconds, like a real panel's samples
+SAMPLE_PERIOD = 1.0
+MAX_POWER_W = 5000.0
+
+
+class FakePanel:
+    """One simulated panel and its HTTP API."""
+
+    def __init__(
+        self,
+        serial: str,
+        circuits: int,
+        seed: int = 0,
+        firmware: str = simulator.FIRMWARE_VERSIONS[-1],
+        latency: float = 0.0,
+    ):
+        """Init the panel with circuits drawn from seed."""
+        self.latency = latency
+        self.request_count = 0
+        self._rng = random.Random(seed)
+        self._status = simulator.status_payload(serial, firmware)
+        self._circuits = simulator.circuits_payload(circuits, seed)
+        self._panel = simulator.panel_payload(self._circuits)
+        # Power each circuit draws while its relay is closed
+        self._load = {
+            id: -circuit["instantPowerW"]
+            for id, circuit in self._circuits["circuits"].items()
+        }
+        self._started = self._sampled = time.time()
+
+    def _advance(self) -> None:
+        """Move power and energy on to now."""
+        now = time.time()
+        elapsed = now - self._sampled
+        if elapsed < SAMPLE_PERIOD:
+            return
+        self._sampled = now
+        rng = self._rng
+        total = 0.0
+        for id, circuit in self._circuits["circuits"].items():
+            load = self._load[id] = min(
+                self._load[id] * math.exp(rng.gauss(0, 0.1)), MAX_POWER_W
+            )
+            power = load if circuit["relayState"] == "CLOSED" else 0.0
+            circuit["instantPowerW"] = -power
+            circuit["instantPowerUpdateTimeS"] = int(now)
+            circuit["consumedEnergyWh"] += power * elapsed / 3600
+            circuit["energyAccumUpdateTimeS"] = int(now)
+            total += power
+        self._panel["instantGridPowerW"] = total
+        self._panel["mainMeterEnergy"]["consumedEnergyWh"] += total * elapsed / 3600
+        self._status["system"]["uptime"] = int(now - self._started)
+
+    def _respond(self, payload: dict) -> web.Response:
+        return web.Response(
+            body=simulator.encode(payload), content_type="application/json"
+        )
+
+    def _get(self, name: str):
+        async def handler(request: web.Request) -> web.Response:
+            self.request_count += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self._advance()
+            return self._respond(getattr(self, f"_{name}"))
+
+        return handler
+
+    async def _post(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        try:
+            payload = await request.json()
+        except ValueError as err:
+            raise web.HTTPBadRequest(reason="Body is not JSON") from err
+
+        if (circuit := self._circuits["circuits"].get(request.match_info["id"])) is None:
+            raise web.HTTPNotFound()
+        if not circuit["is_user_controllable"]:
+            raise web.HTTPBadRequest(reason="Circuit is not user controllable")
+        if "relay_state_in" in payload:
+            circuit["relayState"] = payload["relay_state_in"]["relayState"]
+            # Show the effect on the next poll
+            self._sampled -= SAMPLE_PERIOD
+        elif "priority_in" in payload:
+            circuit["priority"] = payload["priority_in"]["priority"]
+        else:
+            raise web.HTTPBadRequest(reason="Unknown command")
+        return self._respond(circuit)
+
+    def make_app(self) -> web.Application:
+        """Return the aiohttp application serving the panel."""
+        app = web.Application()
+        app.router.add_get("/api/v1/status", self._get("status"))
+        app.router.add_get("/api/v1/panel", self._get("panel"))
+        # Serve the circuits under both names whatever the firmware uses
+        app.router.add_get("/api/v1/circuits", self._get("circuits"))
+        app.router.add_get("/api/v1/spaces", self._get("circuits"))
+        app.router.add_post("/api/v1/circuits/{id}", self._post)
+        app.router.add_post("/api/v1/spaces/{id}", self._post)
+        return app
+
+
+async def serve(
+    panels: int, circuits: int, host: str, port: int, latency: float
+) -> list[web.AppRunner]:
+    """Start panels on consecutive ports and return their runners."""
+    runners = []
+    for index in range(panels):
+        panel = FakePanel(f"nj-fake-{index:04d}", circuits, seed=index, latency=latency)
+        runner = web.AppRunner(panel.make_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port + index).start()
+        runners.append(runner)
+    return runners
+
+
+async def run(args: argparse.Namespace) -> None:
+    runners = await serve(args.panels, args.circuits, args.host, args.port, args.latency)
+    # bench_scale.py waits for this line before connecting
+    print(
+        f"Serving {args.panels} panels on {args.host}:{args.port}-{args.port + args.panels - 1}",
+        flush=True,
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--panels", type=int, default=1)
+    parser.add_argument("--circuits", type=int, default=32)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080, help="port of the first panel")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds to delay each response"
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
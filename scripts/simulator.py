@@ -0,0 +1,74 @@
+"""Synthetic Span Panel payloads for benchmarks and load tests."""
+from __future__ import annotations
+
+import json
+import random
+
+PRIORITIES = ("MUST_HAVE", "NICE_TO_HAVE", "NOT_ESSENTIAL")
+
+# Firmware versions seen in the field, oldest first. tests/test_models.py
+# decodes a fixture of each one.
+FIRMWARE_VERSIONS = (
+    "spanos2/r202216/04",
+    "spanos2/r202223/04",
+    "spanos2/r202232/05",
+)
+
+
+def status_payload(serial: str, firmware: str = "spanos2/r202232/05") -> dict:
+    """Return a /status payload."""
+    return {
+        "software": {"firmwareVersion": firmware, "updateStatus": "idle", "env": "prod"},
+        "system": {
+            "manufacturer": "Span",
+            "serial": serial,
+            "model": "00200",
+            "doorState": "CLOSED",
+            "uptime": 1000,
+        },
+        "network": {"eth0Link": True, "wlanLink": True, "wwanLink": False},
+    }
+
+
+def circuits_payload(count: int, seed: int = 0) -> dict:
+    """Return a /circuits payload with count circuits."""
+    rng = random.Random(seed)
+    circuits = {}
+    for index in range(count):
+        id = f"{seed:08x}{index:024x}"
+        circuits[id] = {
+            "id": id,
+            "name": f"Circuit {index + 1}",
+            "relayState": "CLOSED",
+            "instantPowerW": -rng.uniform(0, 1500),
+            "instantPowerUpdateTimeS": 1000,
+            "producedEnergyWh": rng.uniform(0, 10),
+            "consumedEnergyWh": rng.uniform(0, 500000),
+            "energyAccumUpdateTimeS": 1000,
+            "tabs": [2 * index + 1],
+            "priority": PRIORITIES[index % len(PRIORITIES)],
+            "is_user_controllable": index % 8 != 0,
+            "is_sheddable": False,
+            "is_never_backup": False,
+        }
+    return {"circuits": circuits}
+
+
+def panel_payload(circuits: dict) -> dict:
+    """Return a /panel payload consistent with a /circuits payload."""
+    load = -sum(c["instantPowerW"] for c in circuits["circuits"].values())
+    return {
+        "instantGridPowerW": load,
+        "instantPanelStateOfEnergyPercent": 0,
+        "feedthroughPowerW": 0.0,
+        "mainMeterEnergy": {"producedEnergyWh": 1000.0, "consumedEnergyWh": 900000.0},
+        "feedthroughEnergy": {"producedEnergyWh": 0.0, "consumedEnergyWh": 0.0},
+        "mainRelayState": "CLOSED",
+        "gridSampleStartMs": 0,
+        "gridSampleEndMs": 0,
+    }
+
+
+def encode(payload: dict) -> bytes:
+    """Encode a payload the way the panel sends it."""
+    return json.dumps(payload).encode()
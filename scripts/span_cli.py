@@ -0,0 +1,136 @@
+"""Command line client for a Span Panel.
+
+Prints the panel's status and circuits, or serves a caching proxy so
+several local consumers share one poll of the panel:
+
+    python scripts/span_cli.py span.lan
+    python scripts/span_cli.py span.lan --proxy 8080
+    python scripts/span_cli.py span.lan --proxy 8080 --bind 0.0.0.0
+    python scripts/span_cli.py span.lan --profile 60 --cprofile
+
+The proxy forwards relay and priority commands without authentication,
+so it only listens on localhost unless --bind says otherwise.
+
+Only httpx (and aiohttp for --proxy) are needed, not Home Assistant.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import types
+
+INTEGRATION = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "custom_components", "span_panel"
+)
+
+
+def load_client(module: str):
+    """Import a module of the integration without its Home Assistant __init__."""
+    if "span_client" not in sys.modules:
+        package = types.ModuleType("span_client")
+        package.__path__ = [INTEGRATION]
+        sys.modules["span_client"] = package
+    return importlib.import_module(f"span_client.{module}")
+
+
+async def print_status(span_panel) -> None:
+    """Fetch the panel once and print everything."""
+    await asyncio.gather(
+        span_panel.getStatusData(), span_panel.getPanelData(), span_panel.circuits.getData()
+    )
+    circuits = span_panel.circuits
+    print(f"SN: {span_panel.serial_number}")
+    print(f"FW: {span_panel.firmware_version()}")
+    print(f"Model: {span_panel.model()}")
+    print(f"Door Open: {span_panel.is_door_open()}")
+    print(f"ETH link: {span_panel.is_ethernet_connected()}")
+    print(f"WiFi link: {span_panel.is_wifi_connected()}")
+    print(f"Cell link: {span_panel.is_cellular_connected()}")
+    print(f"Grid power: {span_panel.power()}W")
+    for id in circuits.keys():
+        print()
+        print(circuits.name(id))
+        print("===================")
+        print(f"id: {id}")
+        print(f"power: {circuits.power(id)}W")
+        print(f"produced: {circuits.energy_produced(id)}Wh")
+        print(f"consumed: {circuits.energy_consumed(id)}Wh")
+        print(f"relay closed: {circuits.is_relay_closed(id)}")
+        print(f"prio: {circuits.get_priority(id)}")
+        print(f"user: {circuits.is_user_controllable(id)}")
+        print(f"tabs: {circuits.breaker_positions(id)}")
+
+
+async def profile(span_panel, seconds: float, interval: float, cprofile: bool) -> None:
+    """Poll repeatedly with a profiler attached and print the breakdown."""
+    profiling = load_client("profiling")
+    profiler = span_panel.profiler = profiling.Profiler(cprofile)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    profiler.start()
+    while loop.time() < deadline:
+        with profiler.phase(profiling.UPDATE):
+            await span_panel.circuits.getData()
+            await span_panel.getStatusData()
+            await span_panel.getPanelData()
+        await asyncio.sleep(interval)
+    profiler.stop()
+    span_panel.profiler = None
+    print(profiler.report())
+    if cprofile:
+        print("\n".join(profiler.dump("span_panel_profile")))
+
+
+def serve_proxy(span_panel, host: str, port: int, interval: float) -> None:
+    """Serve the caching proxy until interrupted."""
+    from aiohttp import web
+
+    if host not in ("127.0.0.1", "::1", "localhost"):
+        logging.warning(
+            "Listening on %s: anyone who can reach it can switch breakers", host
+        )
+    proxy = load_client("proxy").SpanPanelProxy(span_panel, interval)
+    web.run_app(proxy.make_app(), host=host, port=port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("host", help="address of the panel")
+    parser.add_argument("--proxy", type=int, metavar="PORT", help="serve a caching proxy")
+    parser.add_argument(
+        "--bind",
+        default="127.0.0.1",
+        metavar="ADDRESS",
+        help="address the proxy listens on (default 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=5.0, help="poll interval in seconds"
+    )
+    parser.add_argument(
+        "--profile", type=float, metavar="SECONDS", help="poll and profile for a while"
+    )
+    parser.add_argument(
+        "--cprofile", action="store_true", help="also write a cProfile with --profile"
+    )
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    span_panel = load_client("span_panel").SpanPanel(args.host)
+
+    if args.proxy:
+        serve_proxy(span_panel, args.bind, args.proxy, args.interval)
+    elif args.profile:
+        asyncio.run(profile(span_panel, args.profile, args.interval, args.cprofile))
+    else:
+        asyncio.run(print_status(span_panel))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Tests for hourly load shift detection against the usage profile."""
+import importlib
+import os
+import sys
+import types
+
+# anomaly.py only needs the panel client, so the package is loaded without
+# its __init__, which sets up the Home Assistant integration
+_PACKAGE = os.path.join(os.path.dirname(__file__), "..", "custom_components", "span_panel")
+if "span_panel" not in sys.modules:
+    _package = types.ModuleType("span_panel")
+    _package.__path__ = [_PACKAGE]
+    sys.modules["span_panel"] = _package
+anomaly = importlib.import_module("span_panel.anomaly")
+
+INTERVAL = 600
+SAMPLES_PER_HOUR = 3600 // INTERVAL
+WEEK = 7 * 24
+
+
+class Circuit:
+    def __init__(self, power):
+        self.instant_power_w = -power
+        self.relay_state = "CLOSED"
+
+
+class Profiles:
+    """Exact running mean per hour of the week, sampled before the detector."""
+
+    def __init__(self):
+        self.hour = 0
+        self._sums = {}
+
+    def sample(self, hour, power):
+        self.hour = hour
+        total, count = self._sums.get(hour, (0.0, 0))
+        self._sums[hour] = (total + power, count + 1)
+
+    def baseline(self, key, index, min_samples):
+        total, count = self._sums.get(index, (0.0, 0))
+        if count < min_samples:
+            return None
+        return total / count
+
+
+def run_hours(detector, profiles, start, loads):
+    """Feed a sample every INTERVAL for consecutive hours and return the anomalies."""
+    changes = []
+    for offset, power in enumerate(loads):
+        hour = (start + offset) % WEEK
+        for _ in range(SAMPLES_PER_HOUR):
+            profiles.sample(hour, power)
+            changes += detector.update({"fridge": Circuit(power)})
+    return changes
+
+
+def test_doubled_load_is_a_power_shift():
+    profiles = Profiles()
+    detector = anomaly.SpanPanelAnomalyDetector(INTERVAL, profiles)
+    weeks = anomaly.PROFILE_MIN_WEEKS
+
+    assert run_hours(detector, profiles, 0, [100.0] * weeks * WEEK) == []
+
+    # An hour is judged when the next one starts
+    changes = run_hours(detector, profiles, 0, [200.0] * (anomaly.SHIFT_HOURS + 1))
+    assert [(c.kind, c.active) for c in changes] == [(anomaly.POWER_SHIFT, True)]
+    assert changes[0].value == 200.0
+    # Of the hour being judged, only its first sample is in the baseline
+    assert changes[0].baseline == (weeks * SAMPLES_PER_HOUR * 100.0 + 200.0) / (
+        weeks * SAMPLES_PER_HOUR + 1
+    )
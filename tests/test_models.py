@@ -0,0 +1,76 @@
+"""Tests for decoding panel payloads of every known firmware."""
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+_ROOT = os.path.join(os.path.dirname(__file__), "..")
+# models.py has no Home Assistant dependencies, so the package is loaded
+# without its __init__, which sets up the integration
+if "span_panel" not in sys.modules:
+    _package = types.ModuleType("span_panel")
+    _package.__path__ = [os.path.join(_ROOT, "custom_components", "span_panel")]
+    sys.modules["span_panel"] = _package
+models = importlib.import_module("span_panel.models")
+sys.path.insert(0, os.path.join(_ROOT, "scripts"))
+simulator = importlib.import_module("simulator")
+
+FIRMWARE = simulator.FIRMWARE_VERSIONS
+
+
+@pytest.fixture(params=["msgspec", "record"])
+def backend(request, monkeypatch):
+    """Decode with msgspec structs, then again with the fallback records."""
+    if request.param == "record":
+        monkeypatch.setattr(models, "msgspec", None)
+        monkeypatch.setattr(models, "_DECODERS", models._build_decoders())
+    elif models.msgspec is None:
+        pytest.skip("msgspec is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("firmware", FIRMWARE)
+def test_payloads_decode_into_attributes(backend, firmware):
+    circuits = simulator.circuits_payload(4)
+    raw_status = simulator.status_payload("nj-test", firmware)
+    raw_panel = simulator.panel_payload(circuits)
+
+    status = models.decode_status(simulator.encode(raw_status), firmware)
+    assert status.system.serial == "nj-test"
+    assert status.system.door_state == raw_status["system"]["doorState"]
+    assert status.network.eth0_link is raw_status["network"]["eth0Link"]
+    assert status.software.firmware_version == firmware
+
+    panel = models.decode_panel(simulator.encode(raw_panel), firmware)
+    assert panel.instant_grid_power_w == raw_panel["instantGridPowerW"]
+    assert panel.main_meter_energy.consumed_energy_wh == (
+        raw_panel["mainMeterEnergy"]["consumedEnergyWh"]
+    )
+
+    decoded = models.decode_circuits(simulator.encode(circuits), firmware)
+    assert decoded.keys() == circuits["circuits"].keys()
+    for id, raw in circuits["circuits"].items():
+        circuit = decoded[id]
+        assert circuit.name == raw["name"]
+        assert circuit.relay_state == raw["relayState"]
+        assert circuit.instant_power_w == raw["instantPowerW"]
+        assert circuit.consumed_energy_wh == raw["consumedEnergyWh"]
+        assert circuit.tabs == raw["tabs"]
+        assert circuit.priority == raw["priority"]
+        assert circuit.is_user_controllable is raw["is_user_controllable"]
+
+
+@pytest.mark.parametrize("firmware", FIRMWARE)
+@pytest.mark.parametrize("key, value", [("tabs", None), ("instantPowerW", "12 W")])
+def test_bad_circuit_fails_naming_the_firmware(backend, firmware, key, value):
+    circuits = simulator.circuits_payload(1)
+    circuit = next(iter(circuits["circuits"].values()))
+    if value is None:
+        del circuit[key]
+    else:
+        circuit[key] = value
+
+    with pytest.raises(models.DecodeError, match=firmware):
+        models.decode_circuits(simulator.encode(circuits), firmware)
@@ -0,0 +1,94 @@
+"""Tests for the request scheduler's shared GETs."""
+import asyncio
+import importlib.util
+import os
+
+# scheduler.py has no dependencies, so it is loaded without the integration
+_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "custom_components", "span_panel", "scheduler.py"
+)
+_spec = importlib.util.spec_from_file_location("span_panel_scheduler", _PATH)
+scheduler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(scheduler)
+
+
+async def _settle():
+    """Let started tasks run up to their first real wait."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class FakePanel:
+    """Answers each GET with the relay state at the time it was sent."""
+
+    def __init__(self):
+        self.state = "CLOSED"
+        self.requests = 0
+        self.release = asyncio.Event()
+
+    async def get(self):
+        self.requests += 1
+        state = self.state
+        await self.release.wait()
+        return state
+
+
+def test_get_after_invalidate_does_not_join_get_in_flight():
+    async def run():
+        requests = scheduler.RequestScheduler()
+        panel = FakePanel()
+
+        stale = asyncio.ensure_future(requests.shared("circuits", panel.get, ttl=5))
+        await _settle()
+        assert panel.requests == 1
+
+        # A command changes the relay while the first GET is in flight
+        panel.state = "OPEN"
+        requests.invalidate()
+
+        fresh = asyncio.ensure_future(requests.shared("circuits", panel.get, ttl=5))
+        await _settle()
+        assert panel.requests == 2
+
+        panel.release.set()
+        assert await stale == "CLOSED"
+        assert await fresh == "OPEN"
+
+        # Only the fresh response is cached
+        assert await requests.shared("circuits", panel.get, ttl=5) == "OPEN"
+        assert panel.requests == 2
+
+    asyncio.run(run())
+
+
+def test_detached_get_completing_keeps_newer_get_shared():
+    async def run():
+        requests = scheduler.RequestScheduler()
+        first, second = FakePanel(), FakePanel()
+
+        stale = asyncio.ensure_future(requests.shared("circuits", first.get))
+        await _settle()
+        requests.invalidate()
+        fresh = asyncio.ensure_future(requests.shared("circuits", second.get))
+        await _settle()
+
+        first.release.set()
+        await stale
+
+        # The detached GET finishing must not unregister the newer one
+        joined = asyncio.ensure_future(requests.shared("circuits", second.get))
+        await _settle()
+        assert second.requests == 1
+        assert requests.coalesced_count == 1
+
+        second.release.set()
+        assert await fresh == await joined
+
+    asyncio.run(run())
+
+
+def test_scheduler_is_released_with_its_last_client():
+    first = scheduler.get_scheduler("span.test")
+    assert scheduler.get_scheduler("span.test") is first
+    del first
+    assert "span.test" not in scheduler._SCHEDULERS